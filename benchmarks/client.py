@@ -0,0 +1,49 @@
+"""
+Times the client side of a Transparency Data query: validating and encoding
+the parameters, and decoding the response. The network is left out by
+answering every request from memory.
+
+    $ python benchmarks/client.py [--records 1000]
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import transparencydata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark building and decoding Transparency Data queries.')
+    parser.add_argument('--records', type=int, default=1000, help='records in the decoded response')
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    empty = b'[]'
+    page = json.dumps([{'amount': '%d.00' % i, 'contributor_name': 'SMITH, JOHN', 'recipient_name': 'Barack Obama (D)',
+                        'date': '2008-06-01', 'cycle': '2008'} for i in range(args.records)]).encode('utf8')
+    body = [empty]
+    transparencydata.urlopen = lambda url: io.BytesIO(body[0])
+
+    client = transparencydata.TransparencyData('key').contributions
+    query = dict(cycle=2008, contributor_state__in=('CA', 'NY'), amount__gt=500,
+                 date__between=(datetime.date(2008, 1, 1), datetime.date(2008, 6, 30)), recipient_ft=u'obama')
+
+    best = min(timeit.repeat(lambda: client(**query), number=args.number, repeat=args.repeat))
+    print('build five-filter query  %8.1f us' % (best / args.number * 1e6))
+
+    body[0] = page
+    best = min(timeit.repeat(lambda: client(**query), number=args.number // 100 or 1, repeat=args.repeat))
+    print('query + decode %d rows  %8.3f ms (%s)' % (args.records, best / (args.number // 100 or 1) * 1000,
+                                                    transparencydata.use_json_backend()))
+
+
+if __name__ == '__main__':
+    main()
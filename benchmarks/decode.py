@@ -0,0 +1,143 @@
+"""
+Times decode_json with every installed JSON backend on two representative
+payloads: a page of Transparency Data contributions and an Influence
+Explorer lat_lng.geo.json map. Then compares the two ways a ``fields=``
+query is decoded, trimming a fully decoded page and streaming it through
+ijson, by time and peak memory.
+
+    $ python benchmarks/decode.py [--rows 5000] [--features 20000]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import transparencydata
+
+
+def contributions(rows):
+    """ A contributions.json page with the API's field names. """
+    rng = random.Random(0)
+    return [{
+        'id': str(1000000 + i),
+        'import_reference': '1',
+        'cycle': '2008',
+        'transaction_namespace': 'urn:fec:transaction',
+        'transaction_id': 'FEC%012d' % i,
+        'transaction_type': rng.choice(['15', '15e', '24k']),
+        'filing_id': str(rng.randint(10000000, 99999999)),
+        'is_amendment': rng.random() < 0.1,
+        'amount': '%.2f' % rng.uniform(1, 5000),
+        'date': '2008-%02d-%02d' % (rng.randint(1, 12), rng.randint(1, 28)),
+        'contributor_name': 'SMITH, JOHN %d' % i,
+        'contributor_ext_id': 'U%08d' % rng.randint(0, 10 ** 8),
+        'contributor_type': 'I',
+        'contributor_occupation': 'ATTORNEY',
+        'contributor_employer': u'SM\xcfTH & ASSOCIATES',
+        'contributor_gender': rng.choice(['M', 'F', 'U']),
+        'contributor_address': '%d MAIN ST' % rng.randint(1, 9999),
+        'contributor_city': 'WASHINGTON',
+        'contributor_state': 'DC',
+        'contributor_zipcode': '20001',
+        'contributor_category': 'K1000',
+        'organization_name': 'Smith & Associates',
+        'organization_ext_id': str(rng.randint(0, 10 ** 6)),
+        'parent_organization_name': '',
+        'parent_organization_ext_id': '',
+        'recipient_name': 'Barack Obama (D)',
+        'recipient_ext_id': 'N00009638',
+        'recipient_party': 'D',
+        'recipient_type': 'P',
+        'recipient_state': 'IL',
+        'recipient_state_held': 'IL',
+        'recipient_category': 'Z1200',
+        'committee_name': 'Obama for America',
+        'committee_ext_id': 'C00431445',
+        'committee_party': 'D',
+        'candidacy_status': None,
+        'district': '',
+        'district_held': '',
+        'seat': 'federal:president',
+        'seat_held': 'federal:senate',
+        'seat_status': 'O',
+        'seat_result': 'W',
+    } for i in range(rows)]
+
+
+def geo(features):
+    """ A lat_lng.geo.json FeatureCollection of point features. """
+    rng = random.Random(0)
+    return {'type': 'FeatureCollection', 'features': [{
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [rng.uniform(-125, -67), rng.uniform(25, 49)]},
+        'properties': {
+            'amount': round(rng.uniform(1, 100000), 2),
+            'count': rng.randint(1, 500),
+            'zipcode': '%05d' % rng.randint(0, 99999),
+            'candidate': rng.choice(['Obama', 'McCain']),
+        },
+    } for i in range(features)]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark JSON backends on API payloads.')
+    parser.add_argument('--rows', type=int, default=5000, help='contribution records')
+    parser.add_argument('--features', type=int, default=20000, help='geo.json features')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    payloads = (
+        ('contributions, %d rows' % args.rows, json.dumps(contributions(args.rows)).encode('utf8')),
+        ('geo.json, %d features' % args.features, json.dumps(geo(args.features)).encode('utf8')),
+    )
+    print(('%-8s %s' % ('backend', '  '.join('%-28s' % name for (name, body) in payloads))).rstrip())
+
+    for backend in transparencydata.JSON_BACKENDS:
+        try:
+            transparencydata.use_json_backend(backend)
+        except ImportError:
+            print('%-8s not installed' % backend)
+            continue
+        times = []
+        for (name, body) in payloads:
+            best = min(timeit.repeat(lambda: transparencydata.decode_json(body), number=1, repeat=args.repeat))
+            times.append('%-28s' % ('%.1f ms' % (best * 1000)))
+        print(('%-8s %s' % (backend, '  '.join(times))).rstrip())
+
+    transparencydata.use_json_backend()
+    body = payloads[0][1]
+    fields = ('amount', 'date', 'contributor_name', 'recipient_name', 'cycle')
+    ijson = transparencydata._ijson()
+    decoders = [('post-filter', lambda: transparencydata._project(transparencydata.decode_json(body), fields))]
+    if ijson is not None:
+        decoders.append(('ijson stream', lambda: transparencydata._stream_project(io.BytesIO(body), fields, ijson)))
+    else:
+        print('ijson 3.1 or later is not installed; fields= queries use the post-filter')
+
+    print('\n%d of %d fields, %d rows' % (len(fields), len(json.loads(body)[0]), args.rows))
+    for (name, decode) in decoders:
+        best = min(timeit.repeat(decode, number=1, repeat=args.repeat))
+        if tracemalloc is None:
+            print('%-13s %8.1f ms' % (name, best * 1000))
+            continue
+        tracemalloc.start()
+        decode()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-13s %8.1f ms  %8.1f MB peak' % (name, best * 1000, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Times importing influenceexplorer in fresh interpreters, with and without
+requests, and reports whether the import pulled requests in.
+
+    $ python benchmarks/import_time.py [--repeat 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SNIPPETS = (
+    ('import requests', 'import requests'),
+    ('import influenceexplorer', 'import influenceexplorer'),
+    ('InfluenceExplorer(key).pol', 'import influenceexplorer; influenceexplorer.InfluenceExplorer("key").pol'),
+)
+
+TIMER = '''
+import sys, time
+started = time.time()
+%s
+print("%%f %%d" %% (time.time() - started, "requests" in sys.modules))
+'''
+
+
+def run(snippet):
+    try:
+        output = subprocess.check_output([sys.executable, '-c', TIMER % snippet], cwd=ROOT, stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError:
+        # requests is not installed
+        return None
+    (seconds, loaded) = output.decode('ascii').split()
+    return (float(seconds), loaded == '1')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark influenceexplorer import time.')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print('%-28s %9s  %s' % ('statement', 'best ms', 'requests imported'))
+    for (name, snippet) in SNIPPETS:
+        results = [run(snippet) for i in range(args.repeat)]
+        if None in results:
+            print('%-28s %9s' % (name, 'failed'))
+            continue
+        print('%-28s %9.1f  %s' % (name, min(s for (s, loaded) in results) * 1000, results[0][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Times calls to Influence Explorer methods generated from the endpoint
+registry against the same methods written by hand, as they were before the
+registry, with the request itself stubbed out. The hand-written methods did
+not check their path arguments; the generated ones check each new string
+once. "same id" calls a method with one entity ID over and over; "new ids"
+uses a different ID on every call, so every call pays the check; "profile
+page" makes five politician calls for a different ID each time, and
+"profile page, cached" does the same with every response served from the
+response cache, as a real page mostly is.
+
+    $ python benchmarks/registry.py [--number 200000]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from influenceexplorer import DEFAULT_CYCLE, DEFAULT_LIMIT, InfluenceExplorer, SubAPI
+
+ENTITY_ID = '4148b26f6f1c437cb50ea9ca4699417a'
+
+
+class HandWritten(SubAPI):
+    """ The hand-written methods the registry replaced. """
+
+    def contributors(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
+        return self._get_url_json('aggregates/pol/%s/contributors.json' % entity_id, cycle, limit)
+
+    def fec_summary(self, entity_id, cycle=DEFAULT_CYCLE):
+        return self._get_hot_json('aggregates/pol/%s/fec_summary.json' % entity_id, cycle)
+
+    def summarize(self, entity_type, indicator, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
+        return self._get_hot_json('aggregates/summary/%s/%s.json' % (entity_type, indicator), cycle)
+
+    def top_n_industries(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
+        return self._get_hot_json('aggregates/industries/top_%s.json' % limit, cycle)
+
+    def industries(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
+        return self._get_url_json('aggregates/pol/%s/contributors/industries.json' % entity_id, cycle, limit)
+
+    def local_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
+        return self._get_url_json('aggregates/pol/%s/contributors/local_breakdown.json' % entity_id, cycle)
+
+    def contributor_type_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
+        return self._get_url_json('aggregates/pol/%s/contributors/type_breakdown.json' % entity_id, cycle)
+
+    def top_n_politicians(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, office=None):
+        if office in ('president', 'senate', 'house', 'governor'):
+            return self._get_hot_json('aggregates/pols/%s/top_%s.json' % (office, limit), cycle)
+        return self._get_hot_json('aggregates/pols/top_%s.json' % limit, cycle)
+
+
+def fetch(path, cycle=None, limit=None, **params):
+    return None
+
+
+class Cached(object):
+    """ A response cache that has every response. """
+
+    def load(self, key):
+        return {}
+
+
+def profile_page(pol, entity_id):
+    pol.contributors(entity_id)
+    pol.industries(entity_id)
+    pol.local_breakdown(entity_id)
+    pol.contributor_type_breakdown(entity_id)
+    pol.fec_summary(entity_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark generated Influence Explorer methods against hand-written ones.')
+    parser.add_argument('--number', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    api = InfluenceExplorer('key')
+    api._get_url_json = api._get_hot_json = fetch
+    hand = HandWritten(api)
+    (pol, entities, summaries) = (api.pol, api.entities, api.summaries)
+    cached = InfluenceExplorer('key', cache=Cached())
+    (cached_pol, cached_hand) = (cached.pol, HandWritten(cached))
+    new_ids = itertools.cycle(['%032x' % i for i in range(100000)])
+
+    calls = [
+        ('pol.contributors, same id', lambda: pol.contributors(ENTITY_ID), lambda: hand.contributors(ENTITY_ID)),
+        ('pol.contributors, new ids', lambda: pol.contributors(next(new_ids)), lambda: hand.contributors(next(new_ids))),
+        ('pol.fec_summary (hot)', lambda: pol.fec_summary(ENTITY_ID), lambda: hand.fec_summary(ENTITY_ID)),
+        ('summaries.summarize', lambda: summaries.summarize('pol', 'top'), lambda: hand.summarize('pol', 'top')),
+        ('entities.top_n_industries', lambda: entities.top_n_industries(limit=10), lambda: hand.top_n_industries(limit=10)),
+        ('entities.top_n_politicians', lambda: entities.top_n_politicians(limit=10), lambda: hand.top_n_politicians(limit=10)),
+        ('profile page', lambda: profile_page(pol, next(new_ids)), lambda: profile_page(hand, next(new_ids))),
+        ('profile page, cached', lambda: profile_page(cached_pol, next(new_ids)),
+         lambda: profile_page(cached_hand, next(new_ids))),
+    ]
+
+    print('%-28s %12s %12s %8s' % ('call', 'registry us', 'by hand us', 'ratio'))
+    for (name, generated, by_hand) in calls:
+        # alternate the two, so both see the same drift in machine speed
+        (g, h) = (float('inf'), float('inf'))
+        for i in range(args.repeat):
+            g = min(g, timeit.timeit(generated, number=args.number))
+            h = min(h, timeit.timeit(by_hand, number=args.number))
+        (g, h) = (g / args.number * 1e6, h / args.number * 1e6)
+        print('%-28s %12.3f %12.3f %8.2f' % (name, g, h, g / h))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,22 @@ The influenceexplorer module provides API wrappers for the data provided on
 InfluenceExplorer.com.
 """
 
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
 
-import requests
 try:
     import json
 except ImportError:
     import simplejson as json
-    
-from transparencydata import DEFAULT_URL
+
+from transparencydata import DEFAULT_URL, _futures, decode_json
 
 
 # defaults of None don't mean that there is not default or no limit--
@@ -21,6 +29,508 @@ DEFAULT_LIMIT = None
 ALL_CYCLES = "-1"
 DEFAULT_CYCLE = ALL_CYCLES # -1 will return career totals.
 
+# Influence Explorer entity IDs, replaced in paths to group profiles by endpoint
+_ENTITY_ID = re.compile(r'[0-9a-f]{32}')
+
+
+# requests is only imported on the first API call, which keeps importing
+# this module cheap for short-lived processes.
+_requests = None
+
+def _http():
+    global _requests
+    if _requests is None:
+        import requests
+        _requests = requests
+    return _requests
+
+
+# msgpack is looked up when the first snapshot store is created; False until then
+_msgpack_module = False
+
+def _msgpack():
+    """ Return the msgpack module, or None when it is not installed. """
+    global _msgpack_module
+    if _msgpack_module is False:
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+        _msgpack_module = msgpack
+    return _msgpack_module
+
+
+def _timed_adapter(profiler, call):
+    """
+    Return a requests transport adapter that records the ``connect`` phase
+    of every connection it opens, for the endpoint named by ``call``, a
+    thread local that also gets the time the connection was made.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def timed(pool_class):
+        connection_class = pool_class.ConnectionCls
+
+        class TimedConnection(connection_class):
+            def connect(self):
+                started = profiler.clock()
+                connection_class.connect(self)
+                call.connected = profiler.record(getattr(call, 'endpoint', None), 'connect', started)
+
+        return type('Timed' + pool_class.__name__, (pool_class,), {'ConnectionCls': TimedConnection})
+
+    pool_classes = {'http': timed(HTTPConnectionPool), 'https': timed(HTTPSConnectionPool)}
+
+    class TimedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+            # the pool manager shares its default classes with every other one
+            self.poolmanager.pool_classes_by_scheme = pool_classes
+
+    return TimedAdapter()
+
+
+def _response_body(r):
+    """
+    Return what to decode from a response: the raw bytes when they are
+    UTF-8, which every JSON backend reads, and the decoded text otherwise.
+    """
+    encoding = r.encoding
+    if encoding is None or _is_utf8(encoding):
+        # requests assumes UTF-8 for JSON without a charset, but it may be UTF-16 or UTF-32
+        encoding = _http().utils.guess_json_utf(r.content) or 'utf-8'
+    if _is_utf8(encoding):
+        return r.content
+    r.encoding = encoding
+    return r.text
+
+
+def _is_utf8(encoding):
+    return encoding.lower().replace('_', '-') in ('utf-8', 'utf8')
+
+
+def _request_key(path, params):
+    """ Return a stable key for a request, ignoring the API key and unset parameters. """
+    query = '&'.join('%s=%s' % (k, params[k]) for k in sorted(params) if k != 'apikey' and params[k] is not None)
+    return hashlib.sha1(('%s?%s' % (path, query)).encode('utf8')).hexdigest()
+
+
+# os.replace overwrites atomically on every platform; Python 2 only has rename
+_replace = getattr(os, 'replace', os.rename)
+
+
+class SnapshotStore(object):
+    """
+    Keeps parsed API responses on disk in a compact binary form.
+
+    Snapshots are written with msgpack when it is installed and as
+    zlib-compressed JSON otherwise. With msgpack, loading memory-maps the
+    file and decodes it in place, so reopening a snapshot costs neither a
+    request nor a JSON parse. The zlib fallback only saves the request: the
+    file is decompressed and parsed in full on every load.
+
+    With ``max_age`` set, snapshots older than ``max_age`` seconds are
+    treated as missing and fetched again.
+    """
+
+    def __init__(self, directory, max_age=None):
+        self.directory = directory
+        self.max_age = max_age
+        self._msgpack = _msgpack()
+        self.extension = '.msgpack' if self._msgpack else '.json.z'
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(url, **params):
+        """
+        Return the key a request is stored under, for :meth:`discard`.
+        ``url`` is the API base URL joined with the endpoint path, for
+        example::
+
+            store.discard(store.key(api.base_url + 'aggregates/pol/%s/fec_timeline.json' % entity_id, cycle='2012'))
+        """
+        return _request_key(url, params)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def load(self, key):
+        """ Return the snapshot stored under ``key`` or None. """
+        try:
+            f = open(self._path(key), 'rb')
+        except (IOError, OSError):
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                return None
+            if self.max_age is not None and time.time() - st.st_mtime > self.max_age:
+                return None
+            if not self._msgpack:
+                # decompression copies the data anyway, so there is nothing to map
+                return decode_json(zlib.decompress(f.read()))
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return self._msgpack.unpackb(buf, raw=False)
+            finally:
+                buf.close()
+
+    def save(self, key, data):
+        """ Store ``data`` under ``key``, replacing any earlier snapshot. Returns the size written. """
+        blob = self._dump(data)
+        self._write(key, blob)
+        return len(blob)
+
+    def _dump(self, data):
+        if self._msgpack:
+            return self._msgpack.packb(data, use_bin_type=True)
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf8'))
+
+    def _write(self, key, blob):
+        # write to a temporary file first so readers never see a partial snapshot
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            _replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def discard(self, key):
+        """ Remove the snapshot stored under ``key``, if any. """
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """ Remove every snapshot in the store. """
+        for name in os.listdir(self.directory):
+            if name.endswith(self.extension):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _default_shared_dir():
+    # /dev/shm is memory backed on Linux; elsewhere fall back to the temp dir.
+    # The directory is per user so other users can't read or plant entries.
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    if hasattr(os, 'getuid'):
+        return os.path.join(base, 'influenceexplorer-%d' % os.getuid())
+    return os.path.join(base, 'influenceexplorer')
+
+
+class _SizeLock(object):
+    """
+    Holds the lock of a shared cache directory and the byte count of its
+    entries, which is kept in a file next to them. ``total`` is None when
+    the count is unknown, and is written back on a clean exit.
+
+    Without ``fcntl`` there is no lock and the count is always unknown.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.size')
+        self.total = None
+        self._fd = None
+
+    def __enter__(self):
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        # opened on every use: a descriptor inherited across fork would share the lock with the parent
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self.total = int(os.read(self._fd, 32))
+        except ValueError:
+            pass
+        except BaseException:
+            os.close(self._fd)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fd is None:
+            return
+        try:
+            if exc_type is None and self.total is not None:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.ftruncate(self._fd, 0)
+                os.write(self._fd, str(self.total).encode('ascii'))
+        finally:
+            # closing the descriptor releases the lock
+            os.close(self._fd)
+            self._fd = None
+
+
+class SharedCache(SnapshotStore):
+    """
+    A size-bounded response cache shared by every process on the host.
+
+    Entries are serialized once into ``directory`` (a directory private to
+    the current user under ``/dev/shm`` by default, so they live in shared
+    memory) and any process pointing at the same directory, such as the
+    workers of a pre-forking server, reads them from there. With ``ttl``
+    set, entries older than ``ttl`` seconds are treated as missing.
+
+    Every process that writes updates one byte count kept in the directory,
+    under a lock, and evicts the least recently used entries before a write
+    that would take the total past ``max_bytes``. So the entries of all
+    processes together stay within ``max_bytes``; an entry larger than that
+    is not cached at all. Where ``fcntl`` is not available (Windows) the
+    directory is scanned before every write instead, and processes writing
+    at the same moment can overshoot the limit by the entries they write.
+
+    The temporary file of a writer that dies mid-write is not counted; it is
+    removed by the next scan of the directory (when a cache is created or
+    entries are evicted) once it is ``orphan_age`` seconds old.
+    """
+
+    # seconds between updates of an entry's last use; LRU order is only this precise
+    touch_interval = 60
+    # seconds after which a temporary file is taken to be left by a writer that died
+    orphan_age = 600
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, ttl=None):
+        if directory is None:
+            directory = _default_shared_dir()
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0o700)
+            st = os.stat(directory)
+            if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+                raise OSError('%s must be owned by the current user and private to it' % directory)
+        SnapshotStore.__init__(self, directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        with _SizeLock(self.directory) as size:
+            size.total = self._evict()
+
+    def load(self, key):
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+            now = time.time()
+            if self.ttl is not None and now - st.st_mtime > self.ttl:
+                return None
+            # atime tracks use for eviction, mtime keeps the write time for the ttl
+            if now - st.st_atime > self.touch_interval:
+                os.utime(path, (now, st.st_mtime))
+        except OSError:
+            return None
+        return SnapshotStore.load(self, key)
+
+    def save(self, key, data):
+        blob = self._dump(data)
+        if len(blob) > self.max_bytes:
+            return
+        path = self._path(key)
+        with _SizeLock(self.directory) as size:
+            replaced = self._size(path)
+            if size.total is None or size.total - replaced + len(blob) > self.max_bytes:
+                size.total = self._evict(len(blob))
+                replaced = self._size(path)
+            self._write(key, blob)
+            size.total += len(blob) - replaced
+
+    def discard(self, key):
+        with _SizeLock(self.directory) as size:
+            removed = self._size(self._path(key))
+            SnapshotStore.discard(self, key)
+            if size.total is not None:
+                size.total -= removed
+
+    def clear(self):
+        with _SizeLock(self.directory) as size:
+            SnapshotStore.clear(self)
+            size.total = 0
+
+    @staticmethod
+    def _size(path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    def _evict(self, reserve=0):
+        """
+        Scan the directory and, if its entries and ``reserve`` more bytes
+        exceed ``max_bytes``, evict down to 90% of it, so the next eviction
+        is some writes away. Returns the size of the entries left.
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith((self.extension, '.tmp')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+                if name.endswith('.tmp'):
+                    if now - st.st_mtime > self.orphan_age:
+                        os.remove(path)
+                    continue
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((st.st_atime, st.st_size, path))
+            total += st.st_size
+
+        if total + reserve > self.max_bytes:
+            low_water = max(self.max_bytes * 9 // 10 - reserve, 0)
+            entries.sort()
+            for (atime, size, path) in entries:
+                if total <= low_water:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+        return total
+
+
+class StaleWhileRevalidate(object):
+    """
+    Serves the last known response for hot endpoints immediately.
+
+    Once a response is older than ``soft_ttl`` seconds it is still returned,
+    and a background thread fetches a fresh copy for the next caller. Only
+    the first call for a request waits for the API. If a background refresh
+    fails, the stale response is kept. At most ``max_entries`` responses
+    are kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, soft_ttl=300, max_entries=1024):
+        self.soft_ttl = soft_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._warmers = []
+        # set on the threads of keep_warm while they make their calls
+        self._warming = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, refresh=None):
+        """
+        Return the response for ``key``, calling ``fetch`` if it has never
+        been seen. Background refreshes call ``refresh``, which defaults to
+        ``fetch``; it should go around any other cache.
+        """
+        if getattr(self._warming, 'active', False):
+            return self._warm(key, refresh or fetch)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+        if entry is None:
+            data = fetch()
+            self._store(key, data)
+            return data
+
+        (fetched_at, data) = entry
+        if time.time() - fetched_at > self.soft_ttl:
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                thread = threading.Thread(target=self._refresh, args=(key, refresh or fetch))
+                thread.daemon = True
+                thread.start()
+        return data
+
+    def _store(self, key, data):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), data)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _warm(self, key, refresh):
+        # marked as refreshing so callers that find the entry stale meanwhile don't fetch it too
+        with self._lock:
+            self._refreshing.add(key)
+        try:
+            data = refresh()
+            self._store(key, data)
+            return data
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def keep_warm(self, calls, interval=None):
+        """
+        Call each of ``calls`` (zero argument callables, such as
+        ``lambda: api.pol.fec_summary(entity_id)``) every ``interval``
+        seconds on a background thread. Every entry those calls reach is
+        refreshed from the API however fresh it is, so with an ``interval``
+        below ``soft_ttl`` callers never find it stale; at the default of
+        ``soft_ttl`` they may for as long as a refresh takes. Stopped by
+        :meth:`stop`.
+        """
+        interval = self.soft_ttl if interval is None else interval
+        stop = threading.Event()
+        with self._lock:
+            self._warmers.append(stop)
+
+        def run():
+            self._warming.active = True
+            while not stop.is_set():
+                for call in calls:
+                    try:
+                        call()
+                    except Exception:
+                        pass
+                stop.wait(interval)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        """ Stop the running ``keep_warm`` threads. ``keep_warm`` can be called again afterwards. """
+        with self._lock:
+            (warmers, self._warmers) = (self._warmers, [])
+        for stop in warmers:
+            stop.set()
+
+
+class _LazySubAPI(object):
+    """
+    Build a sub-API on first attribute access and cache it on the instance,
+    so later lookups never reach this descriptor.
+    """
+
+    def __init__(self, name, class_name):
+        self.name = name
+        self.class_name = class_name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        api = globals()[self.class_name](instance)
+        setattr(instance, self.name, api)
+        return api
+
 
 class InfluenceExplorer(object):
     
@@ -36,59 +546,471 @@ class InfluenceExplorer(object):
         print api.pol.industries(boehner_id)
     """
 
-    def __init__(self, api_key, base_url=DEFAULT_URL):
+    def __init__(self, api_key, base_url=DEFAULT_URL, snapshot_dir=None, cache=None, revalidator=None, profiler=None,
+                 snapshot_max_age=None):
         """
         Create an API wrapper. 
         
         API keys can be obtained from http://services.sunlightlabs.com.
+
+        If ``snapshot_dir`` is given, the large geographical and time series
+        responses are kept there as snapshots (see :class:`SnapshotStore`)
+        and served from disk on later calls, for up to ``snapshot_max_age``
+        seconds when that is set.
+
+        ``cache`` is consulted before every request; pass a
+        :class:`SharedCache` to share responses between processes.
+
+        With a :class:`StaleWhileRevalidate` as ``revalidator``, the hot
+        aggregate endpoints (the ``top_n`` lists, summaries and FEC
+        summaries) return the last known response without waiting for
+        the API.
+
+        Pass a :class:`transparencydata.Profiler` as ``profiler`` to record
+        where the time of each call goes.
         """
         
         self.base_url = base_url if base_url[-1] == '/' else base_url + '/'
         self.api_key = api_key
-        self.entities = Entities(self)
-        self.pol = Politician(self)
-        self.indiv = Individual(self)
-        self.org = Organization(self)
-        self.map_ = Map(self)
-        self.summaries = Summaries(self)
+        self.snapshots = SnapshotStore(snapshot_dir, snapshot_max_age) if snapshot_dir else None
+        self.cache = cache
+        self.revalidator = revalidator
+        self.profiler = profiler
+        self._session = None
+        self._session_lock = threading.Lock()
+        if profiler is not None:
+            # the endpoint and connect time of each thread's call in flight
+            self._call = threading.local()
+
+    entities = _LazySubAPI('entities', 'Entities')
+    pol = _LazySubAPI('pol', 'Politician')
+    indiv = _LazySubAPI('indiv', 'Individual')
+    org = _LazySubAPI('org', 'Organization')
+    map_ = _LazySubAPI('map_', 'Map')
+    summaries = _LazySubAPI('summaries', 'Summaries')
+
+    def batch(self, max_workers=8):
+        """
+        Return a :class:`Batch` that queues calls and dispatches them
+        together when its ``with`` block exits.
+        """
+        return Batch(self, max_workers)
 
+    def _then(self, result, fn, path):
+        """
+        Apply post-processing to the result of a request for ``path``; a
+        :class:`Batch` defers this until its future resolves.
+        """
+        if self.profiler is None:
+            return fn(result)
+        started = self.profiler.clock()
+        try:
+            return fn(result)
+        finally:
+            self.profiler.record(_ENTITY_ID.sub('{id}', path), 'post', started)
+
+    def _get_url_json(self, path, cycle=None, limit=None, bypass_cache=False, **params):
+        """
+        Low level call that just adds the API key, retrieves the URL and parses the JSON.
 
-    def _get_url_json(self, path, cycle=None, limit=None, **params):
-        """ Low level call that just adds the API key, retrieves the URL and parses the JSON. """
+        With ``bypass_cache`` the response cache is not read, but the fresh
+        response is still written to it.
+        """
+
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.clock()
+            endpoint = _ENTITY_ID.sub('{id}', path)
 
         if cycle:
             params.update({'cycle': cycle})
         if limit:
             params.update({'limit': limit})
 
+        if self.cache is not None:
+            key = _request_key(self.base_url + path, params)
+            data = None if bypass_cache else self.cache.load(key)
+            if data is not None:
+                if profiler is not None:
+                    profiler.record(endpoint, 'cache', started)
+                return data
+
         params.update({'apikey': self.api_key})
 
         full_url = self.base_url + path
+        if profiler is not None:
+            started = profiler.record(endpoint, 'build', started)
+
+        session = self._session
+        if session is None:
+            session = self._open_session()
+
+        if profiler is None:
+            r = session.get(full_url, params=params)
+            # this will only raise an HTTPError if one occurred during our request, otherwise it will do nothing.
+            r.raise_for_status()
+            data = decode_json(_response_body(r))
+        else:
+            (self._call.endpoint, self._call.connected) = (endpoint, None)
+            # streaming returns once the headers are in, so the body read can be timed on its own
+            r = session.get(full_url, params=params, stream=True)
+            started = profiler.record(endpoint, 'ttfb', self._call.connected or started)
+            try:
+                r.raise_for_status()
+            except Exception:
+                # a streamed body that is never read keeps its pooled connection
+                r.close()
+                raise
+            body = _response_body(r)
+            started = profiler.record(endpoint, 'transfer', started)
+            data = decode_json(body)
+            profiler.record(endpoint, 'decode', started)
+
+        if self.cache is not None:
+            self.cache.save(key, data)
+        return data
+
+    def _open_session(self):
+        """ Create the wrapper's session, once even when batch threads race for it. """
+        # one session per wrapper so connections are reused between calls
+        with self._session_lock:
+            if self._session is None:
+                session = _http().Session()
+                if self.profiler is not None:
+                    adapter = _timed_adapter(self.profiler, self._call)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _get_snapshot_json(self, path, cycle=None, limit=None, **params):
+        """ Like ``_get_url_json``, but served from the snapshot store when one is configured. """
+
+        if self.snapshots is None:
+            return self._get_url_json(path, cycle, limit, **params)
+
+        key = self.snapshots.key(self.base_url + path, cycle=cycle, limit=limit, **params)
+        data = self.snapshots.load(key)
+        if data is None:
+            data = self._get_url_json(path, cycle, limit, **params)
+            self.snapshots.save(key, data)
+        return data
+
+    def _get_hot_json(self, path, cycle=None, limit=None, **params):
+        """ Like ``_get_url_json``, but served stale-while-revalidate when a revalidator is configured. """
+
+        if self.revalidator is None:
+            return self._get_url_json(path, cycle, limit, **params)
+
+        key = _request_key(self.base_url + path, dict(params, cycle=cycle, limit=limit))
+        return self.revalidator.get(
+            key,
+            lambda: self._get_url_json(path, cycle, limit, **params),
+            lambda: self._get_url_json(path, cycle, limit, bypass_cache=True, **params))
+
+
+def _index_marker_families(families):
+    """ Map each marker to the indexes of the year families it belongs to. """
+    index = {}
+    for (i, (name, markers)) in enumerate(families):
+        for marker in markers:
+            index.setdefault(marker, []).append(i)
+    return tuple((marker, tuple(indexes)) for (marker, indexes) in index.items())
+
+
+class Batch(object):
+    """
+    Queues calls made through its sub-APIs and dispatches them together.
+
+    Every call returns a ``concurrent.futures.Future`` right away::
+
+        with api.batch() as b:
+            contributors = b.pol.contributors(pol_id)
+            issues = b.org.issues(org_id)
+        print contributors.result()
+
+    When the ``with`` block exits, the queued requests are run on at most
+    ``max_workers`` threads sharing the wrapper's connections. Identical
+    calls are sent only once and share a future. If the block raises, the
+    queued calls are cancelled instead.
+
+    Nothing is sent before the block exits (or :meth:`dispatch` is
+    called), so waiting on a future inside the block, for example with
+    ``.result()``, blocks forever.
+    """
+
+    def __init__(self, api, max_workers=8):
+        self._api = api
+        self.max_workers = max_workers
+        self._pending = {}
 
-        r = requests.get(full_url, params=params)
+    entities = _LazySubAPI('entities', 'Entities')
+    pol = _LazySubAPI('pol', 'Politician')
+    indiv = _LazySubAPI('indiv', 'Individual')
+    org = _LazySubAPI('org', 'Organization')
+    map_ = _LazySubAPI('map_', 'Map')
+    summaries = _LazySubAPI('summaries', 'Summaries')
 
-        # this will only raise an HTTPError if one occurred during our request, otherwise it will do nothing.
-        r.raise_for_status()
+    def __enter__(self):
+        return self
 
-        return r.json()
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.dispatch()
+        else:
+            for call in self._pending.values():
+                call[-1].cancel()
+            self._pending = {}
+
+    def dispatch(self):
+        """ Run every queued call. Called automatically at the end of the ``with`` block. """
+        (pending, self._pending) = (self._pending, {})
+        if not pending:
+            return
+
+        def run(call):
+            (method, path, cycle, limit, params, future) = call
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(getattr(self._api, method)(path, cycle, limit, **params))
+            except Exception as e:
+                future.set_exception(e)
+
+        pool = _futures().ThreadPoolExecutor(min(self.max_workers, len(pending)))
+        try:
+            list(pool.map(run, pending.values()))
+        finally:
+            pool.shutdown()
+
+    def _queue(self, method, path, cycle, limit, params):
+        key = (method, _request_key(path, dict(params, cycle=cycle, limit=limit)))
+        if key not in self._pending:
+            self._pending[key] = (method, path, cycle, limit, params, _futures().Future())
+        return self._pending[key][-1]
+
+    def _get_url_json(self, path, cycle=None, limit=None, **params):
+        return self._queue('_get_url_json', path, cycle, limit, params)
+
+    def _get_snapshot_json(self, path, cycle=None, limit=None, **params):
+        return self._queue('_get_snapshot_json', path, cycle, limit, params)
+
+    def _get_hot_json(self, path, cycle=None, limit=None, **params):
+        return self._queue('_get_hot_json', path, cycle, limit, params)
+
+    def _then(self, future, fn, path):
+        chained = _futures().Future()
+        def done(f):
+            try:
+                chained.set_result(self._api._then(f.result(), fn, path))
+            except BaseException as e:
+                chained.set_exception(e)
+        future.add_done_callback(done)
+        return chained
 
 
 class SubAPI(object):
     def __init__(self, main_api):
         self._get_url_json = main_api._get_url_json
+        self._get_snapshot_json = main_api._get_snapshot_json
+        self._get_hot_json = main_api._get_hot_json
+        self._then = main_api._then
+
+
+# every method declared with Endpoint or Route, keyed by 'Class.method'
+ENDPOINTS = {}
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+try:
+    _TEXT = (str, unicode)
+except NameError:
+    _TEXT = (str,)
+
+
+class Endpoint(object):
+    """
+    Declares a sub-API method by the URL template it fetches.
+
+    The placeholders in ``template`` become the method's positional
+    arguments, followed by ``cycle`` and ``limit`` when ``cycle``/``limit``
+    are true. ``cycle`` and ``limit`` are sent as query parameters unless
+    they appear in the template; ``query`` overrides that. ``fetch`` picks
+    the request path: ``'url'``, ``'snapshot'`` or ``'hot'``.
+
+    Path arguments other than ``limit`` are checked against ``validators``
+    by name, and must fill a single path segment otherwise; a bad one
+    raises ValueError before any request is made. Strings that pass are
+    remembered (up to ``checked_size`` per validator, for all endpoints),
+    so calling the methods of an entity checks its ID once.
+
+    Classes decorated with ``_register_endpoints`` get a method for each
+    declaration and record the declaration in ``ENDPOINTS``. The method is
+    compiled from :meth:`source` once, so a call runs the same code as a
+    hand-written method. To change how an endpoint is fetched, change its
+    entry and call :meth:`install` to rebuild the method.
+    """
+
+    fetchers = {'url': '_get_url_json', 'snapshot': '_get_snapshot_json', 'hot': '_get_hot_json'}
+
+    # path arguments checked by name; any other must be a single path segment
+    validators = {'entity_id': re.compile(r'[0-9a-fA-F]{32}\Z')}
+    segment = re.compile(r'[^/?#]+\Z')
+
+    # the strings that passed each validator, by pattern
+    _checked = {}
+    checked_size = 1024
+
+    def __init__(self, template, cycle=True, limit=False, query=None, fetch='url', doc=None):
+        self.template = template
+        self.fields = tuple(_PLACEHOLDER.findall(template))
+        self.path_format = _PLACEHOLDER.sub('%s', template.replace('%', '%%'))
+        self.args = tuple(f for f in self.fields if f != 'limit')
+        self.cycle = cycle
+        self.limit = limit
+        if query is None:
+            query = tuple(p for (p, used) in (('cycle', cycle), ('limit', limit)) if used and p not in self.fields)
+        self.query = query
+        self.fetch = fetch
+        self.doc = doc
+        self.owner = None
+        self.name = None
+        if 'limit' in self.fields and not limit:
+            raise TypeError('%s has a {limit} placeholder but no limit argument' % template)
+
+    def source(self):
+        """ Return the source code of the method. """
+        parameters = ('self',) + self.args + (('cycle=DEFAULT_CYCLE',) if self.cycle else ()) + \
+            (('limit=DEFAULT_LIMIT',) if self.limit else ())
+        if not self.fields:
+            path = repr(self.path_format % ())
+        elif len(self.fields) == 1:
+            path = '%r %% %s' % (self.path_format, self.fields[0])
+        else:
+            path = '%r %% (%s)' % (self.path_format, ', '.join(self.fields))
+
+        arguments = [path]
+        if 'cycle' in self.query:
+            arguments.append('cycle')
+        if 'limit' in self.query:
+            if 'cycle' not in self.query:
+                arguments.append('None')
+            arguments.append('limit')
+
+        lines = ['def %s(%s):' % (self.name, ', '.join(parameters))]
+        for arg in self.args:
+            lines += [
+                '    if %s not in _valid_%s:' % (arg, arg),
+                '        _check_%s(%s)' % (arg, arg),
+            ]
+        lines.append('    return self.%s(%s)' % (self.fetchers[self.fetch], ', '.join(arguments)))
+        return '\n'.join(lines) + '\n'
+
+    def checker(self, arg):
+        """
+        Return ``(valid, check)`` for path argument ``arg``: the strings
+        known to be valid, and the function that raises ValueError unless
+        its argument is valid, adding it to ``valid`` if it is a string.
+        """
+        pattern = self.validators.get(arg, self.segment)
+        match = pattern.match
+        valid = Endpoint._checked.setdefault(pattern, set())
+        method = '%s.%s' % (self.owner.__name__, self.name)
+        size = self.checked_size
+
+        def check(value):
+            if value is None or not match(value if type(value) is str else '%s' % (value,)):
+                raise ValueError('%r is not a valid %s for %s' % (value, arg, method))
+            # only strings: an equal value of another type, such as 1.0 for 1, formats differently
+            if type(value) in _TEXT:
+                if len(valid) >= size:
+                    valid.clear()
+                valid.add(value)
+
+        return (valid, check)
+
+    def build(self):
+        """ Return the method for this endpoint. """
+        namespace = {'__name__': __name__, 'DEFAULT_CYCLE': DEFAULT_CYCLE, 'DEFAULT_LIMIT': DEFAULT_LIMIT}
+        for arg in self.args:
+            (namespace['_valid_' + arg], namespace['_check_' + arg]) = self.checker(arg)
+        exec(compile(self.source(), '<endpoint %s.%s>' % (self.owner.__name__, self.name), 'exec'), namespace)
+        return self._describe(namespace[self.name])
+
+    def _describe(self, method):
+        method.__doc__ = self.doc
+        method.__qualname__ = '%s.%s' % (self.owner.__name__, self.name)
+        method.endpoint = self
+        return method
+
+    def install(self):
+        """ Build the method again and put it on its class, for example after changing ``fetch``. """
+        setattr(self.owner, self.name, self.build())
+
+
+def _check_entity_id(entity_id, method):
+    """ Raise ValueError unless ``entity_id`` is an entity ID, as generated methods do. """
+    if entity_id is None or not Endpoint.validators['entity_id'].match('%s' % (entity_id,)):
+        raise ValueError('%r is not a valid entity_id for %s' % (entity_id, method))
+
+
+class Route(Endpoint):
+    """
+    Records a sub-API method whose URL or parameters depend on its
+    arguments. The method is written by hand, calling the fetcher named by
+    ``fetch`` itself, and installed as it is::
+
+        @Route(fetch='hot')
+        def top_n_politicians(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, office=None):
+            ...
+            return self._get_hot_json('aggregates/pols/top_%s.json' % limit, cycle)
+
+    Routes are in ``ENDPOINTS`` like any other endpoint, but ``fetch``
+    only describes them: to change one, replace its ``function`` and call
+    :meth:`install`.
+    """
+
+    def __init__(self, fetch='url'):
+        self.fetch = fetch
+        self.function = None
+        self.template = None
+        self.doc = None
+        self.owner = None
+        self.name = None
+
+    def __call__(self, function):
+        self.function = function
+        self.doc = function.__doc__
+        return self
+
+    def build(self):
+        """ Return the method for this endpoint: its function. """
+        self.function.endpoint = self
+        return self.function
+
 
+def _register_endpoints(cls):
+    """ Class decorator that builds the class's ``Endpoint`` and ``Route`` declarations into methods. """
+    for (name, value) in list(vars(cls).items()):
+        if isinstance(value, Endpoint):
+            (value.owner, value.name) = (cls, name)
+            value.install()
+            ENDPOINTS['%s.%s' % (cls.__name__, name)] = value
+    return cls
+
+
+@_register_endpoints
 class Summaries(SubAPI):
     """
     Methods related to obtaining aggregate information for groups corresponding
     to main site nav
     """
 
-    def summarize(self, entity_type, indicator, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        return self._get_url_json('aggregates/summary/%s/%s.json'%(entity_type,indicator),cycle)
+    summarize = Endpoint('aggregates/summary/{entity_type}/{indicator}.json', limit=True, query=('cycle',), fetch='hot')
 
-    def metadata(self, entity_type):
-        return self._get_url_json('entities/summary/%s.json'%(entity_type,))
+    metadata = Endpoint('entities/summary/{entity_type}.json', cycle=False)
 
+@_register_endpoints
 class Entities(SubAPI):
     """
     Methods related to searching, listing and ranking entities.
@@ -96,6 +1018,7 @@ class Entities(SubAPI):
     Accessed as ``InfluenceExplorer.entities``.
     """
 
+    @Route()
     def search(self, query, entity_type=None):
         """
         Return entities with names matching the given query.
@@ -113,6 +1036,7 @@ class Entities(SubAPI):
         else:
             return self._get_url_json('entities.json', search=query.encode('ascii', 'ignore'))
 
+    @Route()
     def adv_search(self, query, **kwargs):
         """
         Return entities with names matching the given query, with pagination
@@ -124,41 +1048,76 @@ class Entities(SubAPI):
 
         return self._get_url_json('entities/search.json', **params)
 
-    _camp_fin_markers = ['contributor_count', 'recipient_count', 'independent_expenditure_amount', 'fec_summary_count']
-    _lobbying_markers = ['lobbying_count']
-    _spending_markers = ['grant_count', 'loan_count', 'contract_count']
-    _earmark_markers = ['earmark_count']
-    _contractor_misconduct_markers = ['contractor_misconduct_count']
-    _epa_echo_markers = ['epa_actions_count']
-    _regulations_markers = ['regs_docket_count', 'regs_submitted_docket_count']
-    _faca_markers = ['faca_committee_count', 'faca_member_count']
+    _camp_fin_markers = frozenset(['contributor_count', 'recipient_count', 'independent_expenditure_amount', 'fec_summary_count'])
+    _lobbying_markers = frozenset(['lobbying_count'])
+    _spending_markers = frozenset(['grant_count', 'loan_count', 'contract_count'])
+    _earmark_markers = frozenset(['earmark_count'])
+    _contractor_misconduct_markers = frozenset(['contractor_misconduct_count'])
+    _epa_echo_markers = frozenset(['epa_actions_count'])
+    _regulations_markers = frozenset(['regs_docket_count', 'regs_submitted_docket_count'])
+    _faca_markers = frozenset(['faca_committee_count', 'faca_member_count'])
+
+    # result key and the markers that make a year count towards it
+    _year_families = (
+        ('years', _camp_fin_markers | _lobbying_markers | _spending_markers),
+        ('camp_fin_years', _camp_fin_markers),
+        ('lobbying_years', _lobbying_markers),
+        ('spending_years', _spending_markers),
+        ('earmark_years', _earmark_markers),
+        ('contractor_misconduct_years', _contractor_misconduct_markers),
+        ('epa_echo_years', _epa_echo_markers),
+        ('regulations_years', _regulations_markers),
+        ('faca_years', _faca_markers),
+    )
+    _marker_families = _index_marker_families(_year_families)
+
+    def _add_years(self, results):
+        results.update(self._entity_years(results['totals']))
+        return results
 
+    @Route()
     def metadata(self, entity_id):
         
         """Return all available metadata for the given entity."""
         
-        results = self._get_url_json('entities/%s.json' % entity_id)
-
-        results['years'] = self._entity_years(results['totals'], self._camp_fin_markers + self._lobbying_markers + self._spending_markers)
-        results['camp_fin_years'] = self._entity_years(results['totals'], self._camp_fin_markers)
-        results['lobbying_years'] = self._entity_years(results['totals'], self._lobbying_markers)
-        results['spending_years'] = self._entity_years(results['totals'], self._spending_markers)
-        results['earmark_years'] = self._entity_years(results['totals'], self._earmark_markers)
-        results['contractor_misconduct_years'] = self._entity_years(results['totals'], self._contractor_misconduct_markers)
-        results['epa_echo_years'] = self._entity_years(results['totals'], self._epa_echo_markers)
-        results['regulations_years'] = self._entity_years(results['totals'], self._regulations_markers)
-        results['faca_years'] = self._entity_years(results['totals'], self._faca_markers)
-
-        return results
-
-    def _entity_years(self, totals, keys):
-        years = [year for (year, values) in totals.items() if any([v for (k,v) in values.items() if k in keys]) and year != "-1"]
-        years.sort()
-        if years:
-            return dict(start=years[0], end=years[-1])
-        else:
-            return {}
+        _check_entity_id(entity_id, 'Entities.metadata')
+        path = 'entities/%s.json' % entity_id
+        return self._then(self._get_url_json(path), self._add_years, path)
 
+    def annotate_metadata(self, payloads):
+        """
+        Add the derived ``*_years`` ranges to already fetched metadata
+        payloads, in place. Returns the payloads.
+        """
+        for results in payloads:
+            self._add_years(results)
+        return payloads
+
+    def _entity_years(self, totals):
+        """ Return the start and end year of every year family in one pass over ``totals``. """
+        marker_families = self._marker_families
+        starts = [None] * len(self._year_families)
+        ends = [None] * len(self._year_families)
+
+        for (year, values) in totals.items():
+            if year == ALL_CYCLES:
+                continue
+            active = set()
+            for (marker, families) in marker_families:
+                if values.get(marker):
+                    active.update(families)
+            for i in active:
+                if starts[i] is None or year < starts[i]:
+                    starts[i] = year
+                if ends[i] is None or year > ends[i]:
+                    ends[i] = year
+
+        return dict(
+            (name, dict(start=starts[i], end=ends[i]) if starts[i] is not None else {})
+            for (i, (name, markers)) in enumerate(self._year_families)
+        )
+
+    @Route()
     def id_lookup(self, namespace, id):
         """
         Return the Influence Explorer entity ID based on a 3rd party ID.
@@ -187,14 +1146,16 @@ class Entities(SubAPI):
             return self._get_url_json('entities/id_lookup.json', namespace=namespace, id=id)
 
 
+    @Route()
     def count(self, type=None):
         """ Return the total count of entities. """
         params = {'count': 1}
         if type:
             params['type'] = type
-        return int(self._get_url_json('entities/list.json', **params)['count'])
+        return self._then(self._get_url_json('entities/list.json', **params), lambda r: int(r['count']), 'entities/list.json')
 
 
+    @Route()
     def list(self, start, end, type=None):
         """ List all entities. """
         params = {'start': start, 'end': end}
@@ -204,99 +1165,89 @@ class Entities(SubAPI):
 
 
     # top n lists
-    def top_n_individuals(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top individuals, by amount contributed. """
-        return self._get_url_json('aggregates/indivs/top_%s.json' % limit, cycle)
+    top_n_individuals = Endpoint('aggregates/indivs/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return the top individuals, by amount contributed. """)
 
-    def top_n_indiv_democratic_donors(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top individuals, by amount contributed to Democrats. """
-        return self._get_url_json('aggregates/indivs/party/D/top_%s.json' % limit, cycle)
+    top_n_indiv_democratic_donors = Endpoint('aggregates/indivs/party/D/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return the top individuals, by amount contributed to Democrats. """)
 
-    def top_n_indiv_republican_donors(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top individuals, by amount contributed to Republicans. """
-        return self._get_url_json('aggregates/indivs/party/R/top_%s.json' % limit, cycle)
+    top_n_indiv_republican_donors = Endpoint('aggregates/indivs/party/R/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return the top individuals, by amount contributed to Republicans. """)
 
-    def top_n_organizations(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top organizations, by amount contributed. """
-        return self._get_url_json('aggregates/orgs/top_%s.json' % limit, cycle)
+    top_n_organizations = Endpoint('aggregates/orgs/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return the top organizations, by amount contributed. """)
 
+    @Route(fetch='hot')
     def top_n_politicians(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, office=None):
         """ Return the top politicians, by amount received. """
         if office in ('president', 'senate', 'house', 'governor'):
-            return self._get_url_json('aggregates/pols/%s/top_%s.json' % (office, limit), cycle)
+            return self._get_hot_json('aggregates/pols/%s/top_%s.json' % (office, limit), cycle)
 
-        return self._get_url_json('aggregates/pols/top_%s.json' % limit, cycle)
+        return self._get_hot_json('aggregates/pols/top_%s.json' % limit, cycle)
 
-    def top_n_industries(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top industries, by amount contributed. """
-        return self._get_url_json('aggregates/industries/top_%s.json' % limit, cycle)
+    top_n_industries = Endpoint('aggregates/industries/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return the top industries, by amount contributed. """)
 
-    def candidates_by_location(self, location, cycle=DEFAULT_CYCLE):
-        """ Internal use only. Not maintained. """
-        return self._get_url_json('entities/race/%s.json' % location, cycle)
+    candidates_by_location = Endpoint('entities/race/{location}.json',
+        doc=""" Internal use only. Not maintained. """)
 
-    def election_districts(self, cycle=DEFAULT_CYCLE):
-        """ Internal use only. Not maintained. """
-        return self._get_url_json('entities/race/districts.json', cycle)
+    election_districts = Endpoint('entities/race/districts.json',
+        doc=""" Internal use only. Not maintained. """)
 
-    def bundles(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return any bundling data for the entity. """
-        return self._get_url_json('aggregates/pol/{0}/bundles.json'.format(entity_id), cycle)
+    bundles = Endpoint('aggregates/pol/{entity_id}/bundles.json',
+        doc=""" Return any bundling data for the entity. """)
 
-    def top_n_lobbyist_bundlers(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top lobbyist bundlers. """
-        return self._get_url_json('aggregates/indivs/lobbyist_bundlers/top_{0}.json'.format(limit), cycle)
+    top_n_lobbyist_bundlers = Endpoint('aggregates/indivs/lobbyist_bundlers/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return top lobbyist bundlers. """)
 
+    @Route(fetch='hot')
     def top_n_orgs_lobbying(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, is_industry=False):
         """ Return top industries by lobbying spending. """
         if is_industry:
-            return self._get_url_json('aggregates/industries/lobbying/top_{0}.json'.format(limit), cycle)
+            return self._get_hot_json('aggregates/industries/lobbying/top_{0}.json'.format(limit), cycle)
         else:
-            return self._get_url_json('aggregates/orgs/lobbying/top_{0}.json'.format(limit), cycle)
+            return self._get_hot_json('aggregates/orgs/lobbying/top_{0}.json'.format(limit), cycle)
 
-    def top_n_industry_donors_to_democrats(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top industries by dollars donated to democrats. """
-        return self._get_url_json('aggregates/industries/party/D/top_{0}.json'.format(limit), cycle)
+    top_n_industry_donors_to_democrats = Endpoint('aggregates/industries/party/D/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return top industries by dollars donated to democrats. """)
 
-    def top_n_industry_donors_to_republicans(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top industries by dollars donated to republicans. """
-        return self._get_url_json('aggregates/industries/party/R/top_{0}.json'.format(limit), cycle)
+    top_n_industry_donors_to_republicans = Endpoint('aggregates/industries/party/R/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return top industries by dollars donated to republicans. """)
 
-    def top_n_largest_donations_in_last_month(self, limit=DEFAULT_LIMIT):
-        """ Return largest donations in last month. """
-        return self._get_url_json('aggregates/fec/last_month/largest_{0}.json'.format(limit))
+    top_n_largest_donations_in_last_month = Endpoint('aggregates/fec/last_month/largest_{limit}.json', cycle=False, limit=True, fetch='hot',
+        doc=""" Return largest donations in last month. """)
 
-    def top_n_pacs_by_indexp(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top PACs by independent expenditures. """
-        return self._get_url_json('aggregates/orgs/indexp/top_{0}.json'.format(limit), cycle)
+    top_n_pacs_by_indexp = Endpoint('aggregates/orgs/indexp/top_{limit}.json', limit=True, fetch='hot',
+        doc=""" Return top PACs by independent expenditures. """)
 
+    @Route(fetch='hot')
     def top_n_pols_by_indexp_by_office(self, office, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
         """ Return top politicians by independent expenditures, by office. """
         if office in 'senate house president'.split():
-            return self._get_url_json('aggregates/pols/indexp/{}/top_{}.json'.format(office, limit), cycle)
+            return self._get_hot_json('aggregates/pols/indexp/{}/top_{}.json'.format(office, limit), cycle)
 
-    def top_n_firms_by_income(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top lobbying firms by income. """
-        return self._get_url_json('aggregates/orgs/lobbying_firms/top_{0}.json'.format(limit))
+    top_n_firms_by_income = Endpoint('aggregates/orgs/lobbying_firms/top_{limit}.json', limit=True, query=(), fetch='hot',
+        doc=""" Return top lobbying firms by income. """)
 
+    @Route(fetch='hot')
     def top_n_indivs_by_area(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, area=None):
         """ Return top individuals donating at the state level. """
         if area.lower() in ('state', 'federal'):
-            return self._get_url_json('aggregates/indivs/{}/top_{}.json'.format(area, limit))
+            return self._get_hot_json('aggregates/indivs/{}/top_{}.json'.format(area, limit))
 
-    def top_n_regs_submitters(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top organizations submitting comments on regulations. """
-        return self._get_url_json('aggregates/orgs/regulations/submitters/top_{}.json'.format(limit))
+    top_n_regs_submitters = Endpoint('aggregates/orgs/regulations/submitters/top_{limit}.json', limit=True, query=(), fetch='hot',
+        doc=""" Return top organizations submitting comments on regulations. """)
 
+    @Route(fetch='hot')
     def top_n_org_donors_by_area_contributor_type(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT, area=None, contributor_type=None):
         """ Return top organizations contributing via PACs or employees by area (state/federal). """
         if area in 'state federal'.split() and contributor_type in 'pac employee'.split():
-            return self._get_url_json('aggregates/orgs/{}/{}/top_{}.json'.format(area, contributor_type, limit))
+            return self._get_hot_json('aggregates/orgs/{}/{}/top_{}.json'.format(area, contributor_type, limit))
 
-    def top_n_industries_time_series(self, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        return self._get_url_json('aggregates/industries/top_{0}_industries_time_series.json'.format((limit)), cycle)
+    top_n_industries_time_series = Endpoint('aggregates/industries/top_{limit}_industries_time_series.json', limit=True, fetch='hot')
 
 
+@_register_endpoints
 class Politician(SubAPI):
     """
     Methods relating to a politician entity.
@@ -304,51 +1255,41 @@ class Politician(SubAPI):
     Accessed as ``InfluenceExplorer.pol``.
     """
     
-    def contributors(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top organizational contributors. """
-        return self._get_url_json('aggregates/pol/%s/contributors.json' % entity_id, cycle, limit)
+    contributors = Endpoint('aggregates/pol/{entity_id}/contributors.json', limit=True,
+        doc=""" Return the top organizational contributors. """)
 
-    def sectors(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Not maintained. """
-        return self._get_url_json('aggregates/pol/%s/contributors/sectors.json' % entity_id, cycle, limit)
+    sectors = Endpoint('aggregates/pol/{entity_id}/contributors/sectors.json', limit=True,
+        doc=""" Not maintained. """)
 
-    def industries(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the top contributing industries. """
-        return self._get_url_json('aggregates/pol/%s/contributors/industries.json' % entity_id, cycle, limit)
+    industries = Endpoint('aggregates/pol/{entity_id}/contributors/industries.json', limit=True,
+        doc=""" Return the top contributing industries. """)
 
-    def industries_unknown(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the count and total from unknown industries """
-        return self._get_url_json('aggregates/pol/%s/contributors/industries_unknown.json' % entity_id, cycle)
+    industries_unknown = Endpoint('aggregates/pol/{entity_id}/contributors/industries_unknown.json', limit=True, query=('cycle',),
+        doc=""" Return the count and total from unknown industries """)
 
-    def local_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return the breakdown of in-state vs. out-of-state contributions. """
-        return self._get_url_json('aggregates/pol/%s/contributors/local_breakdown.json' % entity_id, cycle)
+    local_breakdown = Endpoint('aggregates/pol/{entity_id}/contributors/local_breakdown.json',
+        doc=""" Return the breakdown of in-state vs. out-of-state contributions. """)
 
-    def contributor_type_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return the breakdown of individual vs. organization contributions. """
-        return self._get_url_json('aggregates/pol/%s/contributors/type_breakdown.json' % entity_id, cycle)
+    contributor_type_breakdown = Endpoint('aggregates/pol/{entity_id}/contributors/type_breakdown.json',
+        doc=""" Return the breakdown of individual vs. organization contributions. """)
 
-    def earmarks(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top earmarks requested by this politician. """
-        return self._get_url_json('aggregates/pol/%s/earmarks.json' % entity_id, cycle, limit)
+    earmarks = Endpoint('aggregates/pol/{entity_id}/earmarks.json', limit=True,
+        doc=""" Return top earmarks requested by this politician. """)
     
-    def earmarks_local_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return breakdown of earmark amount for in-state vs. out-of-state projects. """
-        return self._get_url_json('aggregates/pol/%s/earmarks/local_breakdown.json' % entity_id, cycle)
+    earmarks_local_breakdown = Endpoint('aggregates/pol/{entity_id}/earmarks/local_breakdown.json',
+        doc=""" Return breakdown of earmark amount for in-state vs. out-of-state projects. """)
         
-    def fec_summary(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return the latest figures from the FECs summary report. """
-        return self._get_url_json('aggregates/pol/%s/fec_summary.json' % entity_id, cycle)
+    fec_summary = Endpoint('aggregates/pol/{entity_id}/fec_summary.json', fetch='hot',
+        doc=""" Return the latest figures from the FECs summary report. """)
 
-    def fec_timeline(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return weekly itemized fundraising totals for the candidate and opponents. """
-        return self._get_url_json('aggregates/pol/%s/fec_timeline.json' % entity_id, cycle)
+    fec_timeline = Endpoint('aggregates/pol/{entity_id}/fec_timeline.json', fetch='snapshot',
+        doc=""" Return weekly itemized fundraising totals for the candidate and opponents. """)
 
-    def fec_indexp(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return independent expenditures for and against the candidate. """
-        return self._get_url_json('aggregates/pol/%s/fec_indexp.json' % entity_id, cycle)
+    fec_indexp = Endpoint('aggregates/pol/{entity_id}/fec_indexp.json',
+        doc=""" Return independent expenditures for and against the candidate. """)
 
 
+@_register_endpoints
 class Individual(SubAPI):
     """
     Methods relating to individual entities.
@@ -356,45 +1297,42 @@ class Individual(SubAPI):
     Accessed as ``InfluenceExplorer.indiv``.
     """
     
-    def org_recipients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        ''' Return the top organizations receiving contributions. '''
-        return self._get_url_json('aggregates/indiv/%s/recipient_orgs.json' % entity_id, cycle, limit)
+    org_recipients = Endpoint('aggregates/indiv/{entity_id}/recipient_orgs.json', limit=True,
+        doc=''' Return the top organizations receiving contributions. ''')
 
 
-    def pol_recipients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        ''' Return the top politicians receiving contributions. '''
-        return self._get_url_json('aggregates/indiv/%s/recipient_pols.json' % entity_id, cycle, limit)
+    pol_recipients = Endpoint('aggregates/indiv/{entity_id}/recipient_pols.json', limit=True,
+        doc=''' Return the top politicians receiving contributions. ''')
 
-    def party_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return breakdown of amount contributed to each party. """
-        return self._get_url_json('aggregates/indiv/%s/recipients/party_breakdown.json' % entity_id, cycle)
+    party_breakdown = Endpoint('aggregates/indiv/{entity_id}/recipients/party_breakdown.json',
+        doc=""" Return breakdown of amount contributed to each party. """)
 
-    def registrants(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    registrants = Endpoint(
+        'aggregates/indiv/{entity_id}/registrants.json', limit=True,
+        doc="""
         Return the lobbying firms that employed the individual.
         
         Only return data for individuals that are registered lobbyists.
-        """
-        
-        return self._get_url_json('aggregates/indiv/%s/registrants.json' % entity_id, cycle, limit)
+        """)
 
-    def issues(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    issues = Endpoint(
+        'aggregates/indiv/{entity_id}/issues.json', limit=True,
+        doc="""
         Return the top issues the individual lobbied on.
         
         Only return data for individuals that are registered lobbyists.
-        """
-        return self._get_url_json('aggregates/indiv/%s/issues.json' % entity_id, cycle, limit)
+        """)
 
-    def clients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    clients = Endpoint(
+        'aggregates/indiv/{entity_id}/clients.json', limit=True,
+        doc="""
         Return the clients the individual was contracted to work for.
         
         Only return data for individuals that are registered lobbyists.
-        """
-        return self._get_url_json('aggregates/indiv/%s/clients.json' % entity_id, cycle, limit)
+        """)
 
 
+@_register_endpoints
 class Organization(SubAPI):
     """ 
     Methods related to organization or industry entities.
@@ -402,160 +1340,145 @@ class Organization(SubAPI):
     Accessed as ``InfluenceExplorer.org``.
     """
 
-    def recipients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top politicians receiving contributions. """
-        return self._get_url_json('aggregates/org/%s/recipients.json' % entity_id, cycle, limit)
+    recipients = Endpoint('aggregates/org/{entity_id}/recipients.json', limit=True,
+        doc=""" Return top politicians receiving contributions. """)
 
 
-    def pac_recipients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        ''' Return the top organizations receiving contributions. '''
-        return self._get_url_json('aggregates/org/%s/recipient_pacs.json' % entity_id, cycle, limit)
+    pac_recipients = Endpoint('aggregates/org/{entity_id}/recipient_pacs.json', limit=True,
+        doc=''' Return the top organizations receiving contributions. ''')
 
-    def party_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return breakdown of amount contributed to each party. """
-        return self._get_url_json('aggregates/org/%s/recipients/party_breakdown.json' % entity_id, cycle)
+    party_breakdown = Endpoint('aggregates/org/{entity_id}/recipients/party_breakdown.json',
+        doc=""" Return breakdown of amount contributed to each party. """)
 
-    def level_breakdown(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return breakdown of amount contributed to state vs. federal races. """
-        return self._get_url_json('aggregates/org/%s/recipients/level_breakdown.json' % entity_id, cycle)
+    level_breakdown = Endpoint('aggregates/org/{entity_id}/recipients/level_breakdown.json',
+        doc=""" Return breakdown of amount contributed to state vs. federal races. """)
 
-    def registrants(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        '''
+    registrants = Endpoint(
+        'aggregates/org/{entity_id}/registrants.json', limit=True,
+        doc='''
         Return lobbying firms hired.
         
         Only return data if organization is a client of lobbying firms.
-        '''
-        return self._get_url_json('aggregates/org/%s/registrants.json' % entity_id, cycle, limit)
+        ''')
 
-    def issues(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    issues = Endpoint(
+        'aggregates/org/{entity_id}/issues.json', limit=True,
+        doc="""
         Return issues lobbied on.
         
         Only return data if organization is a client of lobbying firms.
-        """
-        return self._get_url_json('aggregates/org/%s/issues.json' % entity_id, cycle, limit)
+        """)
     
-    def bills(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    bills = Endpoint(
+        'aggregates/org/{entity_id}/bills.json', limit=True,
+        doc="""
         Return bills lobbied on.
    
         Only return data if organization is a client of lobbying firms.
-        """
-        return self._get_url_json('aggregates/org/%s/bills.json' % entity_id, cycle, limit)
+        """)
 
-    def lobbyists(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    lobbyists = Endpoint(
+        'aggregates/org/{entity_id}/lobbyists.json', limit=True,
+        doc="""
         Return lobbyists hired.
         
         Only return data if organization is a client of lobbying firms.
-        """
-        return self._get_url_json('aggregates/org/%s/lobbyists.json' % entity_id, cycle, limit)
+        """)
 
-    def registrant_clients(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    registrant_clients = Endpoint(
+        'aggregates/org/{entity_id}/registrant/clients.json', limit=True,
+        doc="""
         Return clients that hired this organization to lobby.
         
         Only return data if organization is a lobbying firm.
-        """
-        return self._get_url_json('aggregates/org/%s/registrant/clients.json' % entity_id, cycle, limit)
+        """)
 
-    def registrant_issues(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    registrant_issues = Endpoint(
+        'aggregates/org/{entity_id}/registrant/issues.json', limit=True,
+        doc="""
         Return issues this organization lobbied on.
         
         Only return data if organization is a lobbying firm.
-        """
-        return self._get_url_json('aggregates/org/%s/registrant/issues.json' % entity_id, cycle, limit)
+        """)
 
-    def registrant_bills(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    registrant_bills = Endpoint(
+        'aggregates/org/{entity_id}/registrant/bills.json', limit=True,
+        doc="""
         Return bill this organization lobbied on.
         
         Only return data if organization is a lobbying firm.
-        """
-        return self._get_url_json('aggregates/org/%s/registrant/bills.json' % entity_id, cycle, limit)
+        """)
 
 
-    def registrant_lobbyists(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    registrant_lobbyists = Endpoint(
+        'aggregates/org/{entity_id}/registrant/lobbyists.json', limit=True,
+        doc="""
         Return lobbyists employed.
         
         Only return data if organization is a lobbying firm.
-        """        
-        return self._get_url_json('aggregates/org/%s/registrant/lobbyists.json' % entity_id, cycle, limit)
+        """)
 
-    def industry_orgs(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    industry_orgs = Endpoint(
+        'aggregates/industry/{entity_id}/orgs.json', limit=True,
+        doc="""
         Return top organizations within this industry.
         
         Only return data if entity is an industry.
-        """
-        return self._get_url_json('aggregates/industry/%s/orgs.json' % entity_id, cycle, limit)
+        """)
 
-    def subindustry_totals(self,cycle=DEFAULT_CYCLE):
-        """
+    subindustry_totals = Endpoint(
+        'aggregates/industries/subindustry_totals.json',
+        doc="""
         Return totals for all subindustries in a given cycle
-        """
-        return self._get_url_json('aggregates/industries/subindustry_totals.json', cycle=cycle)
+        """)
 
-    def fed_spending(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """
+    fed_spending = Endpoint(
+        'aggregates/org/{entity_id}/fed_spending.json', limit=True,
+        doc="""
         Return top federal grants and contracts received.
         
         Matching is based on full-text search and may include incorrect matches
         or miss records. Not appropriate for automatic aggregation.
-        """
-        return self._get_url_json('aggregates/org/%s/fed_spending.json' % entity_id, cycle, limit)
+        """)
 
-    def earmarks(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top earmarks received by organization. """
-        return self._get_url_json('aggregates/org/%s/earmarks.json' % entity_id, cycle, limit)
+    earmarks = Endpoint('aggregates/org/{entity_id}/earmarks.json', limit=True,
+        doc=""" Return top earmarks received by organization. """)
 
-    def contractor_misconduct(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top misconduct instances by organization. """
-        return self._get_url_json('aggregates/org/%s/contractor_misconduct.json' % entity_id, cycle, limit)
+    contractor_misconduct = Endpoint('aggregates/org/{entity_id}/contractor_misconduct.json', limit=True,
+        doc=""" Return top misconduct instances by organization. """)
 
-    def regulations_text(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the regulatory dockets that most frequently mention this entity. """
-        return self._get_url_json('aggregates/org/%s/regulations_text.json' % entity_id, cycle, limit)
+    regulations_text = Endpoint('aggregates/org/{entity_id}/regulations_text.json', limit=True,
+        doc=""" Return the regulatory dockets that most frequently mention this entity. """)
     
-    def regulations_submitter(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return the regulatory dockets with the most submissions from this entity. """
-        return self._get_url_json('aggregates/org/%s/regulations_submitter.json' % entity_id, cycle, limit)
+    regulations_submitter = Endpoint('aggregates/org/{entity_id}/regulations_submitter.json', limit=True,
+        doc=""" Return the regulatory dockets with the most submissions from this entity. """)
 
-    def epa_echo(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top EPA enforcement actions by organization. """
-        return self._get_url_json('aggregates/org/%s/epa_enforcement_actions.json' % entity_id, cycle, limit)
+    epa_echo = Endpoint('aggregates/org/{entity_id}/epa_enforcement_actions.json', limit=True,
+        doc=""" Return top EPA enforcement actions by organization. """)
 
-    def faca(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return this entity's employees' memberships on federal advisory committees. """
-        return self._get_url_json('aggregates/org/%s/faca.json' % entity_id, cycle, limit)
+    faca = Endpoint('aggregates/org/{entity_id}/faca.json', limit=True,
+        doc=""" Return this entity's employees' memberships on federal advisory committees. """)
 
-    def fec_summary(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return the latest figures from the FECs summary report. """
-        return self._get_url_json('aggregates/org/%s/fec_summary.json' % entity_id, cycle)
+    fec_summary = Endpoint('aggregates/org/{entity_id}/fec_summary.json',
+        doc=""" Return the latest figures from the FECs summary report. """)
         
-    def fec_indexp(self, entity_id, cycle=DEFAULT_CYCLE):
-        """ Return independent expenditures made by the committee. """
-        return self._get_url_json('aggregates/org/%s/fec_indexp.json' % entity_id, cycle)
+    fec_indexp = Endpoint('aggregates/org/{entity_id}/fec_indexp.json',
+        doc=""" Return independent expenditures made by the committee. """)
 
-    def fec_top_contribs(self, entity_id, cycle=DEFAULT_CYCLE, limit=DEFAULT_LIMIT):
-        """ Return top contributors to the committee. """
-        return self._get_url_json('aggregates/org/%s/fec_top_contribs.json' % entity_id, cycle, limit)
+    fec_top_contribs = Endpoint('aggregates/org/{entity_id}/fec_top_contribs.json', limit=True,
+        doc=""" Return top contributors to the committee. """)
 
 
+@_register_endpoints
 class Map(SubAPI):
     """ 
     Methods that return geographical data.
     
     Accessed as ``InfluenceExplorer.org``.
     """
-    def senate_independent_expenditures(self, cycle=DEFAULT_CYCLE):
-        return self._get_url_json('aggregates/map/indexp/senate/lat_lng.geo.json', cycle)
+    senate_independent_expenditures = Endpoint('aggregates/map/indexp/senate/lat_lng.geo.json', fetch='snapshot')
 
-    def house_independent_expenditures(self, cycle=DEFAULT_CYCLE):
-        return self._get_url_json('aggregates/map/indexp/house/lat_lng.geo.json', cycle)
+    house_independent_expenditures = Endpoint('aggregates/map/indexp/house/lat_lng.geo.json', fetch='snapshot')
 
-    def presidential_contribs(self, state, cycle=DEFAULT_CYCLE):
-        return self._get_url_json('aggregates/map/contributions/presidential/{0}/lat_lng.geo.json'.format(state), cycle)
+    presidential_contribs = Endpoint('aggregates/map/contributions/presidential/{state}/lat_lng.geo.json', fetch='snapshot')
 
@@ -0,0 +1,75 @@
+"""
+An in-memory stand-in for the Transparency Data API, installed in place of
+``transparencydata.urlopen``. It understands the filters ``Client`` encodes
+(plain values, ``__in``, ``__gt``, ``__lt`` and ``__between``) and pages
+like the API.
+"""
+
+import io
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import transparencydata
+
+try:
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:
+    from urlparse import parse_qsl, urlparse
+
+
+def _value(text, like):
+    # compare numbers as numbers and everything else as text
+    if isinstance(like, (int, float)):
+        return float(text)
+    return text
+
+
+def _matches(record, name, value):
+    if name not in record:
+        return False
+    field = record[name]
+    if value.startswith('><|'):
+        (low, high) = value[3:].split('|')
+        return _value(low, field) <= field <= _value(high, field)
+    if value.startswith('>|'):
+        return field > _value(value[2:], field)
+    if value.startswith('<|'):
+        return field < _value(value[2:], field)
+    return str(field) in value.split('|')
+
+
+class FakeAPI(object):
+    """
+    Serves ``records`` for every endpoint. ``requests`` lists the query of
+    each request made; ``fail`` is called with each query and may raise.
+    """
+
+    def __init__(self, records, fail=None):
+        self.records = records
+        self.fail = fail
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def urlopen(self, url):
+        query = dict(parse_qsl(urlparse(url).query))
+        with self._lock:
+            self.requests.append(dict(query))
+        if self.fail is not None:
+            self.fail(query)
+        page = int(query.pop('page', 1))
+        per_page = int(query.pop('per_page', transparencydata.DEFAULT_PER_PAGE))
+        query.pop('apikey', None)
+        matching = [r for r in self.records if all(_matches(r, k, v) for (k, v) in query.items())]
+        body = json.dumps(matching[(page - 1) * per_page:page * per_page]).encode('utf8')
+        return io.BytesIO(body)
+
+    def install(self, test):
+        """ Put this API in place of ``urlopen`` for the duration of ``test``. """
+        original = transparencydata.urlopen
+        transparencydata.urlopen = self.urlopen
+        test.addCleanup(setattr, transparencydata, 'urlopen', original)
+        return self
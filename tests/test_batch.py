@@ -0,0 +1,142 @@
+import concurrent.futures
+import copy
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from influenceexplorer import InfluenceExplorer
+
+
+POL_ID = '4148b26f6f1c437cb50ea9ca4699417a'
+ORG_ID = '7c6b0ba1a0a14a0e9bc2c8e5b0d8e7f0'
+
+RESPONSES = {
+    'entities/%s.json' % POL_ID: {
+        'name': 'A Politician',
+        'totals': {
+            '-1': {'contributor_count': 10, 'lobbying_count': 2},
+            '2008': {'contributor_count': 4},
+            '2010': {'contributor_count': 6, 'lobbying_count': 2},
+        },
+    },
+    'entities/list.json': {'count': '42'},
+}
+
+
+class FakeRequests(object):
+    """ Stands in for ``_get_url_json``, answering from RESPONSES and recording each request. """
+
+    def __init__(self, fail=(), delay=0):
+        self.fail = fail
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path, cycle=None, limit=None, bypass_cache=False, **params):
+        with self._lock:
+            self.requests.append((path, cycle, limit, params))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if path in self.fail:
+                raise ValueError('no response for %s' % path)
+            return copy.deepcopy(RESPONSES.get(path, {'path': path, 'cycle': cycle}))
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = InfluenceExplorer('key')
+        self.api._get_url_json = self.fake = FakeRequests()
+
+    def test_futures_resolve_when_the_block_exits(self):
+        with self.api.batch() as b:
+            contributors = b.pol.contributors(POL_ID)
+            issues = b.org.issues(ORG_ID, cycle='2012')
+            self.assertEqual(self.fake.requests, [])
+            self.assertFalse(contributors.done())
+
+        self.assertEqual(contributors.result(), self.api.pol.contributors(POL_ID))
+        self.assertEqual(issues.result(), self.api.org.issues(ORG_ID, cycle='2012'))
+
+    def test_identical_calls_share_one_future(self):
+        with self.api.batch() as b:
+            first = b.pol.contributors(POL_ID)
+            again = b.pol.contributors(POL_ID)
+            other_cycle = b.pol.contributors(POL_ID, cycle='2012')
+
+        self.assertTrue(first is again)
+        self.assertFalse(first is other_cycle)
+        self.assertEqual(len(self.fake.requests), 2)
+
+    def test_metadata_years_are_added_when_the_future_resolves(self):
+        with self.api.batch() as b:
+            metadata = b.entities.metadata(POL_ID)
+
+        result = metadata.result()
+        self.assertEqual(result['camp_fin_years'], {'start': '2008', 'end': '2010'})
+        self.assertEqual(result['lobbying_years'], {'start': '2010', 'end': '2010'})
+        self.assertEqual(result, self.api.entities.metadata(POL_ID))
+
+    def test_count_is_converted_when_the_future_resolves(self):
+        with self.api.batch() as b:
+            count = b.entities.count()
+        self.assertEqual(count.result(), 42)
+
+    def test_a_failed_request_fails_its_futures_only(self):
+        self.fake.fail = ('entities/%s.json' % POL_ID,)
+        with self.api.batch() as b:
+            metadata = b.entities.metadata(POL_ID)
+            contributors = b.pol.contributors(POL_ID)
+
+        self.assertRaises(ValueError, metadata.result)
+        self.assertEqual(contributors.result()['path'], 'aggregates/pol/%s/contributors.json' % POL_ID)
+
+    def test_an_exception_in_the_block_cancels_the_calls(self):
+        try:
+            with self.api.batch() as b:
+                contributors = b.pol.contributors(POL_ID)
+                metadata = b.entities.metadata(POL_ID)
+                raise KeyError()
+        except KeyError:
+            pass
+
+        self.assertTrue(contributors.cancelled())
+        # the chained future fails with the cancellation of the request
+        self.assertTrue(metadata.done())
+        self.assertRaises(concurrent.futures.CancelledError, metadata.result)
+        self.assertEqual(self.fake.requests, [])
+
+    def test_requests_run_on_at_most_max_workers_threads(self):
+        self.fake.delay = 0.02
+        with self.api.batch(max_workers=3) as b:
+            futures = [b.pol.contributors(POL_ID, cycle=str(cycle)) for cycle in range(1990, 2010, 2)]
+
+        self.assertEqual([f.result()['cycle'] for f in futures], [str(cycle) for cycle in range(1990, 2010, 2)])
+        self.assertTrue(1 < self.fake.most_running <= 3, self.fake.most_running)
+
+    def test_dispatch_sends_the_calls_queued_so_far(self):
+        with self.api.batch() as b:
+            first = b.pol.contributors(POL_ID)
+            b.dispatch()
+            self.assertTrue(first.done())
+            second = b.pol.contributors(POL_ID)
+            self.assertFalse(first is second)
+            self.assertFalse(second.done())
+
+        self.assertEqual(second.result(), first.result())
+        self.assertEqual(len(self.fake.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from influenceexplorer import ENDPOINTS, Endpoint, InfluenceExplorer, Politician
+
+
+ENTITY_ID = '4148b26f6f1c437cb50ea9ca4699417a'
+
+
+class EndpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = InfluenceExplorer('key')
+        self.requests = []
+        for fetch in Endpoint.fetchers.values():
+            setattr(self.api, fetch, self.recorder(fetch))
+
+    def recorder(self, fetch):
+        def record(path, cycle=None, limit=None, **params):
+            self.requests.append((fetch, path, cycle, limit))
+            return {'path': path}
+        return record
+
+    def test_methods_send_their_path_cycle_and_limit(self):
+        self.api.pol.contributors(ENTITY_ID, cycle='2012', limit=5)
+        self.api.entities.top_n_industries(cycle='2012', limit=5)
+        self.api.summaries.summarize('pol', 'top', cycle='2012', limit=5)
+        self.api.map_.presidential_contribs('CA', cycle='2012')
+        self.assertEqual(self.requests, [
+            ('_get_url_json', 'aggregates/pol/%s/contributors.json' % ENTITY_ID, '2012', 5),
+            ('_get_hot_json', 'aggregates/industries/top_5.json', '2012', None),
+            ('_get_hot_json', 'aggregates/summary/pol/top.json', '2012', None),
+            ('_get_snapshot_json', 'aggregates/map/contributions/presidential/CA/lat_lng.geo.json', '2012', None),
+        ])
+
+    def test_bad_path_arguments_raise_before_any_request(self):
+        for entity_id in ('nothex', ENTITY_ID + '0', ENTITY_ID[:-1] + '/', None, 12):
+            self.assertRaises(ValueError, self.api.pol.contributors, entity_id)
+        self.assertRaises(ValueError, self.api.summaries.summarize, 'pol', '../top')
+        self.assertRaises(ValueError, self.api.summaries.summarize, 'pol', '')
+        self.assertEqual(self.requests, [])
+
+    def test_the_error_names_the_argument_and_method(self):
+        try:
+            self.api.pol.contributors('nothex')
+        except ValueError as e:
+            self.assertEqual(str(e), "'nothex' is not a valid entity_id for Politician.contributors")
+        else:
+            self.fail('no ValueError')
+
+    def test_an_id_is_checked_once_for_every_endpoint(self):
+        valid = Endpoint._checked[Endpoint.validators['entity_id']]
+        entity_id = 'ABCDEF0123456789abcdef0123456789'
+        valid.discard(entity_id)
+        self.api.pol.contributors(entity_id)
+        self.assertTrue(entity_id in valid)
+
+        # another endpoint does not check it again: a check would fail now
+        self.addCleanup(valid.discard, 'not an id')
+        valid.add('not an id')
+        self.api.org.issues('not an id')
+        self.assertEqual(self.requests[-1][1], 'aggregates/org/not an id/issues.json')
+
+    def test_install_rebuilds_a_method_with_its_entry(self):
+        endpoint = ENDPOINTS['Politician.fec_summary']
+        self.addCleanup(endpoint.install)
+        self.addCleanup(setattr, endpoint, 'fetch', endpoint.fetch)
+        endpoint.fetch = 'url'
+        endpoint.install()
+
+        self.api.pol.fec_summary(ENTITY_ID)
+        self.assertEqual(self.requests, [('_get_url_json', 'aggregates/pol/%s/fec_summary.json' % ENTITY_ID, '-1', None)])
+        self.assertEqual(Politician.fec_summary.__name__, 'fec_summary')
+        self.assertTrue(Politician.fec_summary.endpoint is endpoint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+import multiprocessing
+import multiprocessing.dummy
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from fakeapi import FakeAPI
+
+import transparencydata
+
+
+# seven 2008 records end part way through page 4; four 2010 records fill pages 1 and 2 exactly
+RECORDS = [{'id': n, 'cycle': 2008, 'amount': n * 10} for n in range(7)] + \
+          [{'id': n, 'cycle': 2010, 'amount': n * 10} for n in range(7, 11)]
+
+
+class Output(list):
+    """ Collects what is written to stderr. """
+
+    def write(self, text):
+        self.append(text)
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeAPI(RECORDS).install(self)
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+        # workers run as threads, so they see the fake API
+        self.addCleanup(setattr, multiprocessing, 'Pool', multiprocessing.Pool)
+        multiprocessing.Pool = multiprocessing.dummy.Pool
+        self.stderr = Output()
+        self.addCleanup(setattr, sys, 'stderr', sys.stderr)
+        sys.stderr = self.stderr
+
+    def export(self, *options):
+        argv = ['contributions', '--key', 'key', '--output', self.output, '--per-page', '2',
+                '--pages-per-chunk', '2', '--processes', '2', '--partition', 'cycle=2008,2010']
+        return transparencydata.main(argv + list(options))
+
+    def files(self):
+        return sorted(os.listdir(self.output))
+
+    def read(self, name):
+        with open(os.path.join(self.output, name)) as f:
+            return f.read()
+
+    def contents(self):
+        return dict((name, self.read(name)) for name in self.files())
+
+    def records(self, name):
+        return [json.loads(line) for line in self.read(name).splitlines()]
+
+    def test_partitions_are_chunked_by_page(self):
+        self.assertEqual(self.export(), 0)
+        self.assertEqual(self.records('contributions-cycle-2008-pages-1-2.jsonl'), RECORDS[:4])
+        self.assertEqual(self.records('contributions-cycle-2008-pages-3-4.jsonl'), RECORDS[4:7])
+        self.assertEqual(self.records('contributions-cycle-2010-pages-1-2.jsonl'), RECORDS[7:])
+
+    def test_chunks_past_the_last_page_are_removed(self):
+        # two workers keep four chunks queued, so chunks past the end of both streams are fetched
+        self.export()
+        self.assertTrue(any(q['cycle'] == '2010' and q['page'] == '3' for q in self.api.requests))
+        self.assertEqual(self.files(), [
+            'contributions-cycle-2008-pages-1-2.jsonl',
+            'contributions-cycle-2008-pages-3-4.jsonl',
+            'contributions-cycle-2010-pages-1-2.jsonl',
+        ])
+
+    def test_an_empty_stream_keeps_its_first_chunk(self):
+        self.export('--pages', '5-8')
+        self.assertEqual(self.files(), [
+            'contributions-cycle-2008-pages-5-6.jsonl',
+            'contributions-cycle-2010-pages-5-6.jsonl',
+        ])
+        self.assertEqual(self.read('contributions-cycle-2008-pages-5-6.jsonl'), '')
+
+    def test_a_rerun_skips_finished_chunks(self):
+        self.export()
+        first = self.contents()
+        del self.api.requests[:]
+
+        self.assertEqual(self.export(), 0)
+        self.assertEqual(self.contents(), first)
+        # only the pages after the written chunks are asked for, to find where each stream ends
+        last_page = {'2008': 4, '2010': 2}
+        self.assertTrue(self.api.requests)
+        self.assertTrue(all(int(q['page']) > last_page[q['cycle']] for q in self.api.requests))
+
+    def test_a_rerun_fetches_missing_chunks(self):
+        self.export()
+        first = self.contents()
+        os.remove(os.path.join(self.output, 'contributions-cycle-2008-pages-1-2.jsonl'))
+
+        self.export()
+        self.assertEqual(self.contents(), first)
+
+    def test_csv_header_has_every_field_of_the_chunk(self):
+        self.api.records = [dict(r) for r in RECORDS]
+        # a field that first appears on the second page of the first chunk
+        self.api.records[3]['note'] = 'late'
+        self.export('--format', 'csv')
+
+        with open(os.path.join(self.output, 'contributions-cycle-2008-pages-1-2.csv')) as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        self.assertEqual(sorted(reader.fieldnames), ['amount', 'cycle', 'id', 'note'])
+        self.assertEqual([r['note'] for r in rows], ['', '', '', 'late'])
+        self.assertEqual([r['id'] for r in rows], ['0', '1', '2', '3'])
+
+    def test_a_failing_worker_exits_with_the_error(self):
+        def fail(query):
+            # only the first chunk: the chunk after it, also queued, is past the end and empty
+            if query['cycle'] == '2010' and query['page'] == '1':
+                raise transparencydata.HTTPError('http://example.com/', 500, 'error', {}, io.BytesIO(b'server error'))
+        self.api.fail = fail
+
+        with self.assertRaises(SystemExit) as raised:
+            self.export()
+        self.assertEqual(raised.exception.code, 1)
+        message = ''.join(self.stderr)
+        self.assertTrue('error: %s' % os.path.join(self.output, 'contributions-cycle-2010-pages-1-2.jsonl') in message)
+        self.assertTrue('TransparencyDataError' in message)
+        # the failed chunk leaves no file, finished or partial
+        self.assertFalse([name for name in self.files() if name.startswith('contributions-cycle-2010-pages-1-2.')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import io
+import unittest
+
+from fakeapi import FakeAPI
+
+import transparencydata
+
+
+RECIPIENTS = ['N%05d' % i for i in range(6)]
+
+# recipient N00000 has 1 record, N00001 has 2 and so on, interleaved by cycle
+RECORDS = [
+    {'id': n, 'recipient_ext_id': RECIPIENTS[i % 6], 'cycle': 2010 if n % 3 else 2012, 'amount': n * 10}
+    for (n, i) in enumerate(i for i in range(6) for repeat in range(i + 1))
+]
+
+
+class QueryPlannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeAPI(RECORDS).install(self)
+        self.client = transparencydata.TransparencyData('key').contributions
+
+    def direct(self, queries, all_pages=False):
+        """ Run each query straight against the client, as the planner's futures should resolve. """
+        if all_pages:
+            return [list(self.client.iter_records(**q)) for q in queries]
+        return [self.client(**q) for q in queries]
+
+    def planned(self, queries, **options):
+        with self.client.plan(**options) as plan:
+            futures = [plan(**q) for q in queries]
+        return [f.result() for f in futures]
+
+    def assertPlannedMatchesDirect(self, queries, all_pages=False):
+        expected = self.direct(queries, all_pages)
+        del self.api.requests[:]
+        self.assertEqual(self.planned(queries, all_pages=all_pages), expected)
+
+    def test_overlapping_queries_are_merged_into_one_request(self):
+        queries = [
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[:3]),
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[2:5]),
+        ]
+        self.assertPlannedMatchesDirect(queries)
+        self.assertEqual(len(self.api.requests), 1)
+        self.assertEqual(self.api.requests[0]['recipient_ext_id'], '|'.join(RECIPIENTS[:5]))
+
+    def test_first_page_only(self):
+        queries = [
+            dict(recipient_ext_id__in=RECIPIENTS[4:], per_page=3),
+            dict(recipient_ext_id__in=RECIPIENTS[3:5], per_page=3),
+        ]
+        self.assertPlannedMatchesDirect(queries)
+        # one merged page, plus the first query, which it only covers two records of
+        self.assertEqual(len(self.api.requests), 2)
+        self.assertTrue(all(len(records) == 3 for records in self.planned(queries)))
+
+    def test_queries_the_merged_page_does_not_cover_are_run_on_their_own(self):
+        # the merged page of 2 x 2 records is filled by the larger recipients first
+        queries = [
+            dict(recipient_ext_id__in=RECIPIENTS[5:], per_page=2),
+            dict(recipient_ext_id__in=RECIPIENTS[:2], per_page=2),
+        ]
+        self.assertPlannedMatchesDirect(queries)
+
+    def test_fields(self):
+        queries = [
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[:4], fields=('amount',)),
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[3:], fields=('amount',)),
+        ]
+        expected = self.direct(queries)
+        self.assertTrue(all(expected))
+        self.assertEqual(self.planned(queries), expected)
+        self.assertEqual(set(k for records in expected for r in records for k in r), set(['amount']))
+
+    def test_all_pages(self):
+        queries = [
+            dict(recipient_ext_id__in=RECIPIENTS[2:], per_page=2),
+            dict(recipient_ext_id__in=RECIPIENTS[:4], per_page=2),
+        ]
+        self.assertPlannedMatchesDirect(queries, all_pages=True)
+
+    def test_all_pages_fetches_each_merged_page_once(self):
+        queries = [
+            dict(recipient_ext_id__in=RECIPIENTS[:4], per_page=4),
+            dict(recipient_ext_id__in=RECIPIENTS[3:], per_page=4),
+        ]
+        self.planned(queries, all_pages=True)
+        pages = [(q['recipient_ext_id'], q['page']) for q in self.api.requests]
+        self.assertEqual(len(pages), len(set(pages)))
+        self.assertEqual(len(pages), len(RECORDS) // 4 + 1)
+
+    def test_all_pages_with_fields(self):
+        queries = [
+            dict(recipient_ext_id__in=RECIPIENTS[:4], per_page=2, fields=('id', 'cycle')),
+            dict(recipient_ext_id__in=RECIPIENTS[1:], per_page=2, fields=('id', 'cycle')),
+        ]
+        self.assertPlannedMatchesDirect(queries, all_pages=True)
+
+    def test_unmergeable_queries_run_as_they_are(self):
+        queries = [
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[:2]),
+            dict(cycle=2012, recipient_ext_id__in=RECIPIENTS[:2]),
+            dict(cycle=2010, recipient_ext_id__in=RECIPIENTS[:2], page=2, per_page=1),
+            dict(cycle=2010),
+        ]
+        self.assertPlannedMatchesDirect(queries)
+        self.assertEqual(len(self.api.requests), len(queries))
+
+    def test_errors_reach_every_merged_future(self):
+        def fail(query):
+            raise transparencydata.HTTPError('http://example.com/', 500, 'error', {}, io.BytesIO(b'server error'))
+        self.api.fail = fail
+        with self.client.plan() as plan:
+            futures = [plan(recipient_ext_id__in=RECIPIENTS[:2]), plan(recipient_ext_id__in=RECIPIENTS[1:3])]
+        for future in futures:
+            self.assertRaises(transparencydata.TransparencyDataError, future.result)
+
+    def test_an_exception_in_the_block_cancels_the_queries(self):
+        try:
+            with self.client.plan() as plan:
+                future = plan(recipient_ext_id__in=RECIPIENTS[:2])
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertTrue(future.cancelled())
+        self.assertEqual(self.api.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
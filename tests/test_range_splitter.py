@@ -0,0 +1,93 @@
+import datetime
+import io
+import threading
+import time
+import unittest
+
+from fakeapi import FakeAPI
+
+import transparencydata
+
+
+START = datetime.date(2008, 1, 1)
+END = datetime.date(2008, 2, 29)
+
+# three records a day through February 2008, each a cent more than the last
+RECORDS = [
+    {'id': n, 'date': (START + datetime.timedelta(days=n // 3)).isoformat(), 'amount': n / 100.0, 'cycle': 2008}
+    for n in range(((END - START).days + 1) * 3)
+]
+
+
+def ids(records):
+    return sorted(r['id'] for r in records)
+
+
+class RangeSplitterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeAPI(RECORDS).install(self)
+        self.client = transparencydata.TransparencyData('key').contributions
+
+        # record the threads started during the test, which are the splitter's workers
+        self.threads = []
+        (threads, original) = (self.threads, threading.Thread)
+
+        class Thread(original):
+            def start(self):
+                threads.append(self)
+                original.start(self)
+
+        threading.Thread = Thread
+        self.addCleanup(setattr, threading, 'Thread', original)
+
+    def splitter(self, field='date', start=START, end=END, per_page=20):
+        return self.client.split(field, start, end, per_page, cycle=2008)
+
+    def assertWorkersStopped(self, workers):
+        self.assertEqual(len(self.threads), workers)
+        self.assertEqual([t for t in self.threads if t.is_alive()], [])
+
+    def test_slices_cover_the_range_once(self):
+        self.assertEqual(ids(self.splitter().records()), ids(RECORDS))
+
+    def test_workers_return_the_same_records(self):
+        for workers in (2, 4, 7):
+            self.assertEqual(ids(self.splitter().records(workers=workers)), ids(RECORDS))
+
+    def test_amounts(self):
+        splitter = self.splitter('amount', 0, RECORDS[-1]['amount'])
+        self.assertEqual(ids(splitter.records(workers=3)), ids(RECORDS))
+
+    def test_a_day_larger_than_a_page_is_paged_through(self):
+        splitter = self.splitter(per_page=2)
+        self.assertEqual(ids(splitter.records(workers=3)), ids(RECORDS))
+
+    def test_closing_early_stops_the_workers(self):
+        records = self.splitter(per_page=5).records(workers=4)
+        for i in range(3):
+            next(records)
+        records.close()
+
+        self.assertWorkersStopped(4)
+        made = len(self.api.requests)
+        time.sleep(0.2)
+        self.assertEqual(len(self.api.requests), made)
+        self.assertTrue(made < len(RECORDS) // 5)
+
+    def test_a_failing_worker_raises_and_stops_the_others(self):
+        def fail(query):
+            if query['date'].startswith('><|2008-02'):
+                raise transparencydata.HTTPError('http://example.com/', 500, 'error', {}, io.BytesIO(b'server error'))
+        self.api.fail = fail
+
+        self.assertRaises(transparencydata.TransparencyDataError, list, self.splitter().records(workers=4))
+        self.assertWorkersStopped(4)
+
+    def test_workers_are_joined_when_the_records_run_out(self):
+        self.assertEqual(ids(self.splitter().records(workers=3)), ids(RECORDS))
+        self.assertWorkersStopped(3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import influenceexplorer
+from influenceexplorer import InfluenceExplorer, StaleWhileRevalidate
+
+
+ENTITY_ID = '4148b26f6f1c437cb50ea9ca4699417a'
+
+
+class Clock(object):
+    """ Stands in for the time module, so entries age only when a test says so. """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class Counter(object):
+    """ A fetch function returning ``first``, ``first + 1``... and recording each call. """
+
+    def __init__(self, first=1, fail=False):
+        self.first = first
+        self.calls = 0
+        self.fail = fail
+        self.called = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.called.set()
+        if self.fail:
+            raise ValueError('unavailable')
+        return self.first + self.calls - 1
+
+
+def eventually(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class StaleWhileRevalidateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.addCleanup(setattr, influenceexplorer, 'time', influenceexplorer.time)
+        influenceexplorer.time = self.clock
+        self.revalidator = StaleWhileRevalidate(soft_ttl=300, max_entries=3)
+        self.addCleanup(self.revalidator.stop)
+
+    def refreshed(self):
+        """ Whether no refresh is running any more. """
+        return eventually(lambda: not self.revalidator._refreshing)
+
+    def test_only_the_first_call_fetches(self):
+        fetch = Counter()
+        self.assertEqual(self.revalidator.get('key', fetch), 1)
+        self.clock.now += 300
+        self.assertEqual(self.revalidator.get('key', fetch), 1)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_a_stale_entry_is_returned_and_refreshed_for_the_next_caller(self):
+        (fetch, refresh) = (Counter(), Counter(first=10))
+        self.revalidator.get('key', fetch, refresh)
+        self.clock.now += 301
+
+        self.assertEqual(self.revalidator.get('key', fetch, refresh), 1)
+        self.assertTrue(self.refreshed())
+        self.assertEqual(self.revalidator.get('key', fetch, refresh), 10)
+        self.assertEqual((fetch.calls, refresh.calls), (1, 1))
+
+    def test_a_failed_refresh_keeps_the_stale_entry(self):
+        refresh = Counter(fail=True)
+        self.revalidator.get('key', Counter())
+        self.clock.now += 301
+
+        self.revalidator.get('key', Counter(), refresh)
+        self.assertTrue(self.refreshed())
+        self.assertEqual(refresh.calls, 1)
+        self.assertEqual(self.revalidator.get('key', Counter(fail=True)), 1)
+
+    def test_one_refresh_at_a_time(self):
+        release = threading.Event()
+        refreshes = []
+        def refresh():
+            refreshes.append(1)
+            release.wait(5)
+            return 2
+        self.revalidator.get('key', Counter())
+        self.clock.now += 301
+
+        for i in range(3):
+            self.assertEqual(self.revalidator.get('key', Counter(), refresh), 1)
+        release.set()
+        self.assertTrue(self.refreshed())
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(self.revalidator.get('key', Counter()), 2)
+
+    def test_the_least_recently_used_entries_are_dropped(self):
+        for key in ('a', 'b', 'c'):
+            self.revalidator.get(key, Counter())
+        # using a makes b the least recently used
+        self.revalidator.get('a', Counter())
+        self.revalidator.get('d', Counter())
+
+        fetches = dict((key, Counter()) for key in 'abcd')
+        for key in 'acd':
+            self.revalidator.get(key, fetches[key])
+        self.assertEqual([fetches[key].calls for key in 'acd'], [0, 0, 0])
+        self.revalidator.get('b', fetches['b'])
+        self.assertEqual(fetches['b'].calls, 1)
+
+    def test_warming_refreshes_entries_before_they_go_stale(self):
+        (fetch, refresh) = (Counter(), Counter(first=10))
+        self.revalidator.get('key', fetch, refresh)
+        # still fresh when the warmer runs
+        self.clock.now += 299
+
+        warmer = self.revalidator.keep_warm([lambda: self.revalidator.get('key', fetch, refresh)], interval=60)
+        self.assertTrue(refresh.called.wait(5))
+        self.revalidator.stop()
+        warmer.join(5)
+
+        # so it is fresh, from the refresh, when it would have gone stale
+        self.clock.now += 2
+        self.assertEqual(self.revalidator.get('key', fetch, refresh), 10)
+        self.assertEqual((fetch.calls, refresh.calls), (1, 1))
+        self.assertFalse(self.revalidator._refreshing)
+
+    def test_warming_goes_around_the_response_cache(self):
+        requests = []
+        def get_url_json(path, cycle=None, limit=None, bypass_cache=False, **params):
+            requests.append((path, bypass_cache))
+            return {'path': path}
+        api = InfluenceExplorer('key', revalidator=self.revalidator)
+        api._get_url_json = get_url_json
+
+        api.pol.fec_summary(ENTITY_ID)
+        warmer = self.revalidator.keep_warm([lambda: api.pol.fec_summary(ENTITY_ID)], interval=60)
+        self.assertTrue(eventually(lambda: len(requests) == 2))
+        self.revalidator.stop()
+        warmer.join(5)
+
+        path = 'aggregates/pol/%s/fec_summary.json' % ENTITY_ID
+        self.assertEqual(requests, [(path, False), (path, True)])
+
+    def test_stop_ends_every_warmer(self):
+        calls = []
+        threads = [self.revalidator.keep_warm([lambda: calls.append(1)], interval=0.01) for i in range(2)]
+        self.assertTrue(eventually(lambda: len(calls) >= 4))
+
+        self.revalidator.stop()
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        made = len(calls)
+        time.sleep(0.05)
+        self.assertEqual(len(calls), made)
+
+        # and warming can start again
+        thread = self.revalidator.keep_warm([lambda: calls.append(1)], interval=0.01)
+        self.assertTrue(eventually(lambda: len(calls) > made))
+        self.revalidator.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import influenceexplorer
+from influenceexplorer import SharedCache, _SizeLock
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def entry_bytes(cache):
+    """ The size of the entries in a cache's directory. """
+    return sum(os.path.getsize(os.path.join(cache.directory, name))
+               for name in os.listdir(cache.directory) if name.endswith(cache.extension))
+
+
+def stored_total(cache):
+    with open(os.path.join(cache.directory, '.size')) as f:
+        return int(f.read())
+
+
+def write_entries(directory, max_bytes, seed, results):
+    """ Write entries of random sizes, recording the most bytes the directory held after each write. """
+    rng = random.Random(seed)
+    cache = SharedCache(directory, max_bytes)
+    peak = 0
+    for i in range(40):
+        text = ''.join(rng.choice(string.ascii_letters) for n in range(rng.randint(200, 3000)))
+        # some keys are written again, replacing the earlier entry
+        cache.save('%d-%d' % (seed, i % 25), {'value': text})
+        with _SizeLock(directory):
+            peak = max(peak, entry_bytes(cache))
+    results.put(peak)
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def fill(self, cache, count):
+        """ Save ``count`` entries of the same size with increasing last use. Returns the size of one. """
+        for i in range(count):
+            cache.save(str(i), {'value': 'x' * 1000 + '%02d' % i})
+            path = cache._path(str(i))
+            os.utime(path, (i, os.stat(path).st_mtime))
+        sizes = set(os.path.getsize(cache._path(str(i))) for i in range(count))
+        self.assertEqual(len(sizes), 1)
+        return sizes.pop()
+
+    def keys(self, cache):
+        return sorted((name[:-len(cache.extension)] for name in os.listdir(self.directory) if name.endswith(cache.extension)), key=int)
+
+    @unittest.skipIf(fcntl is None, 'the byte count is only shared where fcntl is available')
+    def test_processes_together_stay_within_max_bytes(self):
+        max_bytes = 20000
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=write_entries, args=(self.directory, max_bytes, seed, results))
+                     for seed in range(8)]
+        for p in processes:
+            p.start()
+        peaks = [results.get(timeout=60) for p in processes]
+        for p in processes:
+            p.join()
+
+        self.assertTrue(max(peaks) <= max_bytes, peaks)
+        # enough was written to evict
+        self.assertTrue(max(peaks) > max_bytes * 9 // 10, peaks)
+        cache = SharedCache(self.directory, max_bytes)
+        self.assertEqual(stored_total(cache), entry_bytes(cache))
+
+    def test_least_recently_used_are_evicted_to_90_percent(self):
+        cache = SharedCache(self.directory, 10 ** 6)
+        size = self.fill(cache, 10)
+        cache.max_bytes = size * 10
+        # use the first entry again, so it is the most recent
+        path = cache._path('0')
+        os.utime(path, (100, os.stat(path).st_mtime))
+
+        cache.save('10', {'value': 'x' * 1000 + '10'})
+        # room is made for the new entry within 90%: the two least recently used go
+        self.assertEqual(self.keys(cache), ['0', '3', '4', '5', '6', '7', '8', '9', '10'])
+        self.assertEqual(entry_bytes(cache), size * 9)
+
+    @unittest.skipIf(fcntl is None, 'the byte count is only kept where fcntl is available')
+    def test_the_count_follows_saves_discards_and_clears(self):
+        cache = SharedCache(self.directory, 10 ** 6)
+        self.fill(cache, 5)
+        cache.save('1', {'value': 'replaced'})
+        self.assertEqual(stored_total(cache), entry_bytes(cache))
+
+        cache.discard('2')
+        cache.discard('missing')
+        self.assertEqual(self.keys(cache), ['0', '1', '3', '4'])
+        self.assertEqual(stored_total(cache), entry_bytes(cache))
+
+        cache.clear()
+        self.assertEqual(self.keys(cache), [])
+        self.assertEqual(stored_total(cache), 0)
+
+    def test_entries_larger_than_max_bytes_are_not_cached(self):
+        cache = SharedCache(self.directory, 100)
+        cache.save('large', {'value': ''.join(random.choice(string.ascii_letters) for n in range(1000))})
+        self.assertEqual(cache.load('large'), None)
+
+    def test_orphaned_temporary_files_are_removed(self):
+        orphan = os.path.join(self.directory, 'orphan.tmp')
+        writing = os.path.join(self.directory, 'writing.tmp')
+        for path in (orphan, writing):
+            with open(path, 'w') as f:
+                f.write('partial')
+        old = time.time() - SharedCache.orphan_age - 1
+        os.utime(orphan, (old, old))
+
+        SharedCache(self.directory)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(writing))
+
+    @unittest.skipIf(not hasattr(os, 'getuid'), 'directories are only checked where there are user ids')
+    def test_the_default_directory_must_be_private(self):
+        directory = os.path.join(self.directory, 'shared')
+        self.addCleanup(setattr, influenceexplorer, '_default_shared_dir', influenceexplorer._default_shared_dir)
+        influenceexplorer._default_shared_dir = lambda: directory
+
+        # created private when missing
+        SharedCache()
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+
+        os.chmod(directory, 0o755)
+        self.assertRaises(OSError, SharedCache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,16 +8,50 @@ __version__ = "0.1"
 __copyright__ = "Copyright (c) 2010 Sunlight Labs"
 __license__ = "BSD"
 
+import csv
+import datetime
+import heapq
+import io
+import os
+import pickle
 import sys
+import tempfile
+import threading
+import time
+from collections import deque
 
 if sys.version_info[0] == 3:
     from urllib.parse import urlencode, urljoin
-    from urllib.request import urlopen
+    from urllib.request import urlopen, build_opener, HTTPHandler, HTTPSHandler
     from urllib.error import HTTPError
+    from http.client import HTTPConnection, HTTPSConnection
+    from queue import Full, Queue
+
+    def _param_value(value):
+        # urlencode encodes str and str()s anything else, no need to do it twice
+        return value
+
+    def _open_export(path):
+        return io.open(path, 'w', newline='', encoding='utf8')
+
+    def _csv_record(record):
+        return record
 else:    
     from urllib import urlencode
     from urlparse import urljoin
-    from urllib2 import HTTPError, urlopen
+    from urllib2 import HTTPError, urlopen, build_opener, HTTPHandler, HTTPSHandler
+    from httplib import HTTPConnection, HTTPSConnection
+    from Queue import Full, Queue
+
+    def _param_value(value):
+        return value.encode('utf8') if isinstance(value, unicode) else str(value)
+
+    # the Python 2 csv module only writes byte strings, to files opened in binary mode
+    def _open_export(path):
+        return open(path, 'wb')
+
+    def _csv_record(record):
+        return dict((k, v.encode('utf8') if isinstance(v, unicode) else v) for (k, v) in record.items())
 
 try:
     import json
@@ -26,35 +60,281 @@ except ImportError:
 
 DEFAULT_URL = "http://transparencydata.com/api/1.0/"
 DEFAULT_PARAMETERS = ('apikey','page','per_page')
+DEFAULT_PER_PAGE = 1000 # page size the API uses when per_page is not given
 DEFAULT_HANDLERS = {}
 
 class TransparencyDataError(Exception):
     pass
 
 
+# json decoding
+
+# tried in order when no backend has been chosen
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+
+_json_backend = None
+
+def _load_json_backend(name):
+    """ Return ``(name, loads)`` for a JSON backend, raising ImportError if it is not installed. """
+    if name == 'orjson':
+        import orjson
+        return (name, orjson.loads)
+    if name == 'ujson':
+        import ujson
+        return (name, ujson.loads)
+    if name == 'json':
+        return (name, json.loads)
+    raise TransparencyDataError('%s is not a known JSON backend' % name)
+
+
+def use_json_backend(name=None):
+    """
+    Select the JSON decoder used for API responses and return its name.
+
+    Without a name the first installed backend in ``JSON_BACKENDS`` is
+    used. Naming a backend that is not installed raises ImportError.
+    """
+    global _json_backend
+    for candidate in ((name,) if name else JSON_BACKENDS):
+        try:
+            _json_backend = _load_json_backend(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        return candidate
+
+
+def _select_json_backend():
+    """ Select the default JSON backend unless one has been chosen already. """
+    if _json_backend is None:
+        use_json_backend()
+
+
+def decode_json(data):
+    """ Decode a JSON response body with the selected backend. """
+    if _json_backend is None:
+        use_json_backend()
+    return _json_backend[1](data)
+
+
+def _futures():
+    """ Return ``concurrent.futures``, which Python 2 only has through the ``futures`` backport. """
+    try:
+        import concurrent.futures
+    except ImportError:
+        raise ImportError('batched and planned queries need concurrent.futures; on Python 2 install the futures package')
+    return concurrent.futures
+
+
+_endpoint_urls = {}
+
+def _endpoint_url(base_url, endpoint):
+    """ Join an endpoint onto a base URL once and remember the result. """
+    try:
+        return _endpoint_urls[(base_url, endpoint)]
+    except KeyError:
+        url = _endpoint_urls[(base_url, endpoint)] = urljoin(base_url, endpoint)
+        return url
+
+
+def _project(records, fields):
+    """ Return ``records`` with only ``fields`` kept in each record. """
+    return [dict((k, record[k]) for k in fields if k in record) for record in records]
+
+
+# ijson is looked up on the first projected query; False until then
+_ijson_module = False
+
+def _ijson():
+    """ Return the ijson module, or None unless ijson 3.1 or later is installed. """
+    global _ijson_module
+    if _ijson_module is False:
+        try:
+            import ijson
+            # use_float, which decodes numbers like the other backends, is new in 3.1
+            if tuple(int(v) for v in ijson.__version__.split('.')[:2]) < (3, 1):
+                ijson = None
+        except (ImportError, ValueError):
+            ijson = None
+        _ijson_module = ijson
+    return _ijson_module
+
+
+def _stream_project(stream, fields, ijson):
+    """
+    Decode a JSON array of records from the file-like ``stream`` one record
+    at a time, keeping only ``fields`` of each. Neither the body nor a page
+    of whole records is ever held in memory.
+    """
+    try:
+        return _project(ijson.items(stream, 'item', use_float=True), fields)
+    except ijson.JSONError as e:
+        raise ValueError(str(e))
+
+
+# profiling
+
+class Profiler(object):
+    """
+    Collects per-phase timings of API calls, for ``TransparencyData`` and
+    ``InfluenceExplorer`` clients created with ``profiler=``.
+
+    Phases are ``build`` (parameters and URL), ``connect`` (DNS and TCP/TLS
+    connection), ``ttfb`` (request sent until response headers arrive),
+    ``transfer`` (reading the body), ``decode`` (JSON) and ``post``
+    (client-side post-processing such as ``Entities.metadata``'s year
+    ranges), plus ``cache`` for Influence Explorer cache hits. Influence
+    Explorer reuses pooled connections, so only calls that open a new
+    connection have a ``connect`` phase.
+
+    Totals per endpoint and phase are kept for every call, but only the
+    last ``max_events`` individual events are kept for the trace, so a
+    profiler can stay attached to a long-running process.
+    """
+
+    clock = staticmethod(getattr(time, 'perf_counter', time.time))
+
+    def __init__(self, max_events=100000):
+        self.max_events = max_events
+        self.events = deque(maxlen=max_events)
+        self._totals = {}
+        self._lock = threading.Lock()
+        # import the JSON backend now rather than in the first timed decode
+        _select_json_backend()
+
+    def record(self, endpoint, phase, started, ended=None):
+        """ Record a phase that ran from ``started`` until ``ended`` (default now). Returns ``ended``. """
+        if ended is None:
+            ended = self.clock()
+        duration = ended - started
+        with self._lock:
+            self.events.append((endpoint, phase, started, duration, threading.current_thread().ident))
+            (calls, total, longest) = self._totals.get((endpoint, phase), (0, 0.0, 0.0))
+            self._totals[(endpoint, phase)] = (calls + 1, total + duration, max(longest, duration))
+        return ended
+
+    def reset(self):
+        """ Discard all recorded events and totals. """
+        with self._lock:
+            self.events = deque(maxlen=self.max_events)
+            self._totals = {}
+
+    def summary(self):
+        """ Return ``{endpoint: {phase: (calls, total seconds, max seconds)}}``. """
+        summary = {}
+        with self._lock:
+            totals = list(self._totals.items())
+        for ((endpoint, phase), phase_totals) in totals:
+            summary.setdefault(endpoint, {})[phase] = phase_totals
+        return summary
+
+    def report(self):
+        """ Return the summary as a text table, one row per endpoint and phase. """
+        lines = ['%-60s %-9s %7s %11s %11s %11s' % ('endpoint', 'phase', 'calls', 'total ms', 'mean ms', 'max ms')]
+        for (endpoint, phases) in sorted(self.summary().items()):
+            for phase in _PROFILE_PHASES + tuple(sorted(set(phases) - set(_PROFILE_PHASES))):
+                if phase in phases:
+                    (calls, total, longest) = phases[phase]
+                    lines.append('%-60s %-9s %7d %11.3f %11.3f %11.3f' % (
+                        endpoint, phase, calls, total * 1000, total * 1000 / calls, longest * 1000))
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """ Return the kept events in Chrome's trace event format (load in chrome://tracing or Perfetto). """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        return {'traceEvents': [
+            {'name': phase, 'cat': endpoint, 'ph': 'X', 'pid': pid, 'tid': thread,
+             'ts': started * 1e6, 'dur': duration * 1e6, 'args': {'endpoint': endpoint}}
+            for (endpoint, phase, started, duration, thread) in events
+        ]}
+
+    def dump_chrome_trace(self, path):
+        """ Write :meth:`chrome_trace` to ``path`` as JSON. """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+_PROFILE_PHASES = ('build', 'cache', 'connect', 'ttfb', 'transfer', 'decode', 'post')
+
+
+class _ConnectTimer(object):
+    """ Records the ``connect`` phase of the connections urllib opens for one call. """
+
+    def __init__(self, profiler, endpoint):
+        self.profiler = profiler
+        self.endpoint = endpoint
+        self.connected = None
+
+    def wrap(self, connection_class):
+        timer = self
+
+        class TimedConnection(connection_class):
+            def connect(self):
+                started = timer.profiler.clock()
+                connection_class.connect(self)
+                timer.connected = timer.profiler.record(timer.endpoint, 'connect', started)
+
+        return TimedConnection
+
+
+class _TimedHTTPHandler(HTTPHandler):
+    def __init__(self, timer):
+        HTTPHandler.__init__(self)
+        self.timer = timer
+
+    def http_open(self, req):
+        return self.do_open(self.timer.wrap(HTTPConnection), req)
+
+
+class _TimedHTTPSHandler(HTTPSHandler):
+    def __init__(self, timer):
+        HTTPSHandler.__init__(self)
+        self.timer = timer
+
+    def https_open(self, req):
+        return self.do_open(self.timer.wrap(HTTPSConnection), req, context=self._context)
+
+
 # base client
 class Client(object):
     
-    def __init__(self, key, base_url=DEFAULT_URL):
+    def __init__(self, key, base_url=DEFAULT_URL, profiler=None):
         self.apikey = key
         self.apiurl = base_url
         self.debug = False
+        self.profiler = profiler
+
+        # clients generated from ENDPOINTS come with their valid parameter names;
+        # other subclasses have them hashed once per class
+        cls = type(self)
+        if '_valid_parameters' not in cls.__dict__:
+            cls._valid_parameters = frozenset(cls.parameters) | frozenset(DEFAULT_PARAMETERS)
         
-    def __call__(self, **kwargs):
+    def __call__(self, fields=None, **kwargs):
         
+        profiler = self.profiler
+        if profiler is not None:
+            started = profiler.clock()
+
         kwargs['apikey'] = self.apikey
         params = {}
+        # the API has no parameter for fields, so they are trimmed while decoding
+        project = tuple(fields) if fields else None
         
         handlers = {}
         handlers.update(DEFAULT_HANDLERS)
         if hasattr(self, 'handlers'):
             handlers.update(self.handlers)
         
-        for param, value in kwargs.iteritems():
+        valid = self._valid_parameters
+        for param, value in kwargs.items():
             
             (name, operator) = param.split('__') if '__' in param else (param, None)
             
-            if name not in self.parameters and name not in DEFAULT_PARAMETERS:
+            if name not in valid:
                 raise TransparencyDataError('%s is not a valid parameter' % param)
             
             if operator == 'in':
@@ -72,33 +352,388 @@ class Client(object):
             elif operator == 'between':
                 if not isinstance(value, (list, tuple)):
                     raise TransparencyDataError('%s__%s must be a tuple or list' % (name, operator))
-                start = value[0].strftime("%Y-%m-%d")
-                end = value[1].strftime("%Y-%m-%d")
+                (start, end) = [v.strftime("%Y-%m-%d") if hasattr(v, 'strftime') else v for v in value[:2]]
                 value = "><|%s|%s" % (start, end)
             
             handler = handlers.get(name, None)
             if handler:
                 value = handler(name, value, operator)
             
-            params[name] = value.encode('utf8')
+            params[name] = _param_value(value)
 
-        url = "%s?%s" % (urljoin(self.apiurl, self.endpoint), urlencode(params))
+        url = "%s?%s" % (_endpoint_url(self.apiurl, self.endpoint), urlencode(params))
+        if profiler is not None:
+            profiler.record(self.endpoint, 'build', started)
         if self.debug:
-            print url
+            print(url)
             return
         
         try:
-            response = urlopen(url).read().decode()
-            return json.loads(response)
-        except HTTPError, e:
-            raise TransparencyDataError(e.read())
-        except (ValueError, KeyError), e:
+            ijson = _ijson() if project else None
+            if profiler is None:
+                if ijson is not None:
+                    response = urlopen(url)
+                    try:
+                        return _stream_project(response, project, ijson)
+                    finally:
+                        response.close()
+                # the decoders take the raw bytes and detect the encoding themselves
+                data = decode_json(urlopen(url).read())
+                return _project(data, project) if project else data
+
+            response = self._profiled_read(url, profiler)
+            started = profiler.clock()
+            if ijson is not None:
+                data = _stream_project(io.BytesIO(response), project, ijson)
+            else:
+                data = decode_json(response)
+                if project:
+                    data = _project(data, project)
+            profiler.record(self.endpoint, 'decode', started)
+            return data
+        except HTTPError as e:
+            raise TransparencyDataError(e.read().decode('utf8', 'replace'))
+        except (ValueError, KeyError):
             raise TransparencyDataError('Invalid Response')
 
-# base types
-class ContributionsClient(Client):
-    endpoint = 'contributions.json'
-    parameters = (
+    def _profiled_read(self, url, profiler):
+        """ Fetch ``url`` like ``urlopen(url).read()``, recording connect, ttfb and transfer. """
+        timer = _ConnectTimer(profiler, self.endpoint)
+        opener = build_opener(_TimedHTTPHandler(timer), _TimedHTTPSHandler(timer))
+        started = profiler.clock()
+        response = opener.open(url)
+        headers_at = profiler.record(self.endpoint, 'ttfb', timer.connected or started)
+        body = response.read()
+        profiler.record(self.endpoint, 'transfer', headers_at)
+        return body
+
+    def iter_pages(self, per_page=1000, start_page=1, end_page=None, **kwargs):
+        """
+        Yield ``(page, records)`` for successive pages of a query, stopping
+        after ``end_page`` or at the first page with fewer than ``per_page``
+        records.
+        """
+        page = start_page
+        while end_page is None or page <= end_page:
+            records = self(page=page, per_page=per_page, **kwargs)
+            if records:
+                yield (page, records)
+            if len(records) < per_page:
+                return
+            page += 1
+
+    def iter_records(self, per_page=1000, **kwargs):
+        """ Yield every record of a query, one page in memory at a time. """
+        for (page, records) in self.iter_pages(per_page, **kwargs):
+            for record in records:
+                yield record
+
+    def split(self, field, start, end, per_page=1000, **kwargs):
+        """
+        Return a :class:`RangeSplitter` that pulls this query in shallow
+        slices of ``field`` between ``start`` and ``end``.
+        """
+        return RangeSplitter(self, field, start, end, per_page, **kwargs)
+
+    def plan(self, record_fields=None, all_pages=False):
+        """ Return a :class:`QueryPlanner` that merges ``__in`` queries against this client. """
+        return QueryPlanner(self, record_fields, all_pages)
+
+class RangeSplitter(object):
+    """
+    Pulls a large query as non-overlapping ``field__between`` slices of a
+    date or amount range instead of deep page offsets.
+
+    Slice widths adapt to the number of records returned: a full page
+    halves the width and retries the slice, and sparse slices widen the
+    next one so that it returns about half a page. Dates are split by day
+    and amounts by cent; a single day or cent that holds more than a page
+    is paged through.
+    """
+
+    # seconds to wait for workers to finish their requests in flight once records() ends
+    join_timeout = 10
+
+    def __init__(self, client, field, start, end, per_page=1000, initial_slices=16, **filters):
+        self.client = client
+        self.field = field
+        self.per_page = per_page
+        self.filters = filters
+
+        if isinstance(start, datetime.date):
+            self._encode = lambda d: d.toordinal()
+            self._decode = datetime.date.fromordinal
+        else:
+            self._encode = lambda amount: int(round(amount * 100))
+            self._decode = lambda cents: cents / 100.0
+
+        self.low = self._encode(start)
+        self.high = self._encode(end)
+        self.initial_width = max(1, (self.high - self.low + 1) // initial_slices)
+
+    def _fetch(self, low, high, page=1):
+        kwargs = dict(self.filters)
+        kwargs['%s__between' % self.field] = (self._decode(low), self._decode(high))
+        return self.client(page=page, per_page=self.per_page, **kwargs)
+
+    def slices(self, low=None, high=None):
+        """ Yield ``((start, end), records)`` for consecutive slices of the range. """
+        low = self.low if low is None else low
+        high = self.high if high is None else high
+        width = self.initial_width
+
+        while low <= high:
+            end = min(low + width - 1, high)
+            records = self._fetch(low, end)
+
+            if len(records) >= self.per_page:
+                if end > low:
+                    width = max(1, (end - low + 1) // 2)
+                    continue
+                page = 2
+                while True:
+                    more = self._fetch(low, end, page)
+                    records.extend(more)
+                    if len(more) < self.per_page:
+                        break
+                    page += 1
+
+            yield ((self._decode(low), self._decode(end)), records)
+
+            # aim the next slice at half a page, growing at most fourfold
+            target = (end - low + 1) * self.per_page // (2 * max(len(records), 1))
+            width = max(1, min(width * 4, target))
+            low = end + 1
+
+    def records(self, workers=1):
+        """
+        Yield every record in the range. With ``workers`` > 1 the range is
+        divided evenly and each part is split and fetched on its own thread;
+        records then arrive in no particular order. When the generator is
+        closed or a worker fails, the other workers are stopped and joined.
+        """
+        if workers <= 1:
+            for (bounds, records) in self.slices():
+                for record in records:
+                    yield record
+            return
+
+        span = self.high - self.low + 1
+        parts = [(self.low + span * i // workers, self.low + span * (i + 1) // workers - 1) for i in range(workers)]
+        parts = [(low, high) for (low, high) in parts if low <= high]
+        results = Queue(maxsize=workers * 2)
+        done = object()
+        # set when the consumer stops early or fails, so workers don't block on a full queue
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def work(low, high):
+            try:
+                for (bounds, records) in self.slices(low, high):
+                    if stop.is_set() or not put(records):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        threads = []
+        for (low, high) in parts:
+            thread = threading.Thread(target=work, args=(low, high))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        remaining = len(parts)
+        try:
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    for record in item:
+                        yield record
+        finally:
+            stop.set()
+            # a worker stops after its current request; don't hang on one that never returns
+            deadline = time.time() + self.join_timeout
+            for thread in threads:
+                thread.join(max(deadline - time.time(), 0))
+
+
+def _unique(values):
+    """ Return ``values`` without duplicates, keeping their order. """
+    seen = set()
+    unique = []
+    for value in values:
+        if str(value) not in seen:
+            seen.add(str(value))
+            unique.append(value)
+    return unique
+
+
+class QueryPlanner(object):
+    """
+    Collects queries and merges those that differ only in the values of
+    one ``__in`` filter into a single request for the union of the values::
+
+        with td.contributions.plan() as plan:
+            a = plan(cycle=2010, recipient_ext_id__in=[x, y])
+            b = plan(cycle=2010, recipient_ext_id__in=[y, z])
+        a.result()
+
+    Each call returns a ``concurrent.futures.Future``. When the ``with``
+    block exits, one request is made per merged group and its records are
+    split back out to each caller by the record field matching the
+    filter, which is the parameter name unless ``record_fields`` maps it to
+    another.
+
+    Futures resolve to what calling the client directly would return: the
+    first page. The merged request asks for a page as large as all of the
+    group's first pages together. When the union is larger than that, any
+    query left with less than a full page from it is run on its own as
+    well, so in this mode the planner can make more requests than it
+    saves. With ``all_pages``, futures resolve to every matching record,
+    across all pages, and a merged group always takes one pass over its
+    pages. Queries that ask for a specific ``page`` are always run as they
+    are.
+    """
+
+    def __init__(self, client, record_fields=None, all_pages=False):
+        self.client = client
+        self.record_fields = record_fields or {}
+        self.all_pages = all_pages
+        self._pending = []
+
+    def __call__(self, **kwargs):
+        future = _futures().Future()
+        self._pending.append((kwargs, future))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            for (kwargs, future) in self._pending:
+                future.cancel()
+            self._pending = []
+
+    def execute(self):
+        """ Run the pending queries. Called automatically at the end of the ``with`` block. """
+        (pending, self._pending) = (self._pending, [])
+
+        groups = {}
+        for (kwargs, future) in pending:
+            in_params = [p for (p, v) in kwargs.items() if p.endswith('__in') and isinstance(v, (list, tuple))]
+            if 'page' in kwargs or len(in_params) != 1:
+                groups[(None, id(future))] = [(kwargs, future)]
+                continue
+            others = tuple(sorted((k, repr(v)) for (k, v) in kwargs.items() if k != in_params[0]))
+            groups.setdefault((in_params[0], others), []).append((kwargs, future))
+
+        for ((param, others), queries) in groups.items():
+            if param is None or len(queries) == 1:
+                self._run(queries)
+                continue
+
+            name = param[:-len('__in')]
+            field = self.record_fields.get(name, name)
+
+            merged = dict(queries[0][0])
+            merged[param] = _unique(v for (kwargs, future) in queries for v in kwargs[param])
+            fields = merged.get('fields')
+            if fields and field not in fields:
+                # records are split out by this field, so it has to survive the projection
+                merged['fields'] = list(fields) + [field]
+            per_page = int(merged.get('per_page', DEFAULT_PER_PAGE))
+            if not self.all_pages:
+                # room for every query's first page
+                merged['per_page'] = per_page * len(queries)
+            try:
+                records = self._fetch(merged) if self.all_pages else self.client(**merged)
+            except Exception as e:
+                for (kwargs, future) in queries:
+                    future.set_exception(e)
+                continue
+            complete = self.all_pages or len(records) < merged['per_page']
+
+            unresolved = []
+            for (kwargs, future) in queries:
+                wanted = set(str(v) for v in kwargs[param])
+                share = [r for r in records if str(r.get(field)) in wanted]
+                if not self.all_pages:
+                    if len(share) >= per_page:
+                        share = share[:per_page]
+                    elif not complete:
+                        # this query's first page may continue past the merged page
+                        unresolved.append((kwargs, future))
+                        continue
+                future.set_result(_project(share, fields) if fields else share)
+            self._run(unresolved)
+
+    def _run(self, queries):
+        """ Run each of ``queries`` on its own. """
+        for (kwargs, future) in queries:
+            try:
+                if self.all_pages and 'page' not in kwargs:
+                    result = self._fetch(kwargs)
+                else:
+                    result = self.client(**kwargs)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _fetch(self, kwargs):
+        records = []
+        for (page, page_records) in self.client.iter_pages(**kwargs):
+            records.extend(page_records)
+        return records
+
+
+# endpoint registry
+
+class Endpoint(object):
+    """
+    Declares a Transparency Data endpoint: the ``TransparencyData``
+    attribute it is reached by, the name of its ``Client`` class, its path
+    and the query parameters it accepts. The client classes are generated
+    from these declarations, each with the set of valid parameter names
+    built once, so validating a keyword is a single set lookup.
+    """
+
+    def __init__(self, name, class_name, path, parameters):
+        self.name = name
+        self.class_name = class_name
+        self.path = path
+        self.parameters = tuple(parameters)
+        self.valid_parameters = frozenset(self.parameters) | frozenset(DEFAULT_PARAMETERS)
+
+    def client_class(self):
+        """ Return the ``Client`` subclass for this endpoint. """
+        return type(str(self.class_name), (Client,), {
+            '__module__': __name__,
+            'endpoint': self.path,
+            'parameters': self.parameters,
+            '_valid_parameters': self.valid_parameters,
+            'schema': self,
+        })
+
+
+ENDPOINTS = (
+    Endpoint('contributions', 'ContributionsClient', 'contributions.json', (
         'contributor_state',
         'recipient_state',
         'cycle',
@@ -121,11 +756,8 @@ class ContributionsClient(Client):
         'employer_ft',
         'organization_ft',
         'recipient_ft',
-    )
-
-class LobbyingClient(Client):
-    endpoint = 'lobbying.json'
-    parameters = (
+    )),
+    Endpoint('lobbying', 'LobbyingClient', 'lobbying.json', (
         'lobbyist_is_rep',
         'industry',
         'transaction_id',
@@ -134,18 +766,15 @@ class LobbyingClient(Client):
         'year',
         'issue',
         'client_ext_id',
-        'lobbyist_ext_id', 
+        'lobbyist_ext_id',
         'candidate_ext_id',
         'client_ft',
-        'client_parent_ft', 
+        'client_parent_ft',
         'lobbyist_ft',
         'registrant_ft',
         'issue_ft',
-    )
-
-class EarmarkClient(Client):
-    endpoint = 'earmarks.json'
-    parameters = (
+    )),
+    Endpoint('earmarks', 'EarmarkClient', 'earmarks.json', (
         'year',
         'state',
         'member_party',
@@ -154,25 +783,17 @@ class EarmarkClient(Client):
         'description',
         'city',
         'member',
-        'recipient', 
-    )
-    
-
-class GrantsClient(Client):
-    endpoint = 'grants.json'
-    parameters = (
+        'recipient',
+    )),
+    Endpoint('grants', 'GrantsClient', 'grants.json', (
         'assistance_type',
         'fiscal_year',
-        'recipient_state', 
+        'recipient_state',
         'recipient_type',
         'agency_ft',
         'recipient_ft',
-    )
-    
-
-class ContractsClient(Client):
-    endpoint = 'contracts.json'
-    parameters = (
+    )),
+    Endpoint('contracts', 'ContractsClient', 'contracts.json', (
         'agency_id',
         'contracting_agency_id',
         'fiscal_year',
@@ -191,16 +812,435 @@ class ContractsClient(Client):
         'vendor_city',
         'obligated_amount',
         'current_amount',
-        'maximum_amount',    
-    )
+        'maximum_amount',
+    )),
+)
+
+# attribute name and client class of every endpoint
+CLIENTS = tuple((endpoint.name, endpoint.client_class()) for endpoint in ENDPOINTS)
+
+(ContributionsClient, LobbyingClient, EarmarkClient, GrantsClient, ContractsClient) = [
+    client_class for (name, client_class) in CLIENTS]
 
 
 # main wrapper
 class TransparencyData(object):
     
-    def __init__(self, key):
-        self.contributions = ContributionsClient(key)
-        self.lobbying = LobbyingClient(key)
-        self.earmarks = EarmarkClient(key)
-        self.grants = GrantsClient(key)
-        self.contracts = ContractsClient(key)
+    def __init__(self, key, profiler=None):
+        for (name, client_class) in CLIENTS:
+            setattr(self, name, client_class(key, profiler=profiler))
+
+
+# stream operators
+
+def top_k(records, k, key, largest=True):
+    """
+    Return the ``k`` records with the largest (or smallest) ``key`` from an
+    iterable of records, holding only ``k`` records in memory.
+    """
+    if largest:
+        return heapq.nlargest(k, records, key=key)
+    return heapq.nsmallest(k, records, key=key)
+
+
+def _spill(items):
+    f = tempfile.TemporaryFile()
+    for item in items:
+        pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+
+def _unspill(f):
+    with f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class _Reversed(object):
+    """ Wraps a sort key so that it orders in reverse. """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _keyed_run(run, key, reverse, index):
+    # the run index and position break ties, so records themselves are never compared
+    for (position, record) in enumerate(run):
+        k = key(record)
+        yield (_Reversed(k) if reverse else k, index, position, record)
+
+
+def external_sort(records, key, reverse=False, chunk_size=100000):
+    """
+    Yield records sorted by ``key``, holding at most ``chunk_size`` records
+    in memory. Larger inputs are sorted in runs that are spilled to
+    temporary files and merged.
+    """
+    runs = []
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            chunk.sort(key=key, reverse=reverse)
+            runs.append(_spill(chunk))
+            chunk = []
+    chunk.sort(key=key, reverse=reverse)
+
+    if not runs:
+        for record in chunk:
+            yield record
+        return
+
+    if chunk:
+        runs.append(_spill(chunk))
+        chunk = None
+    # heapq.merge only takes key and reverse from Python 3.5, so the runs are decorated instead
+    keyed = [_keyed_run(_unspill(run), key, reverse, i) for (i, run) in enumerate(runs)]
+    for item in heapq.merge(*keyed):
+        yield item[-1]
+
+
+def group_reduce(records, key, reduce, initial, combine, max_groups=100000, partitions=16):
+    """
+    Yield ``(group, value)`` pairs, where each value is ``reduce`` folded
+    over the group's records starting from ``initial``. For example, the
+    total given to each recipient::
+
+        group_reduce(records, lambda r: r['recipient_name'],
+                     lambda total, r: total + float(r['amount']), 0, operator.add)
+
+    At most ``max_groups`` groups are kept in memory. Beyond that, partial
+    results are spilled to ``partitions`` temporary files by group hash,
+    and each file is combined on its own with ``combine``, which merges two
+    partial values of the same group. A file that still holds more than
+    ``max_groups`` groups is split again on other bits of the group hash.
+    """
+    table = {}
+    spills = None
+    for record in records:
+        group = key(record)
+        table[group] = reduce(table.get(group, initial), record)
+        if len(table) > max_groups:
+            spills = _spill_groups(table, partitions, spills, 0)
+            table = {}
+
+    if spills is None:
+        for item in table.items():
+            yield item
+        return
+
+    spills = _spill_groups(table, partitions, spills, 0)
+    for item in _combine_spills(spills, combine, max_groups, partitions, 1):
+        yield item
+
+
+def _combine_spills(spills, combine, max_groups, partitions, depth):
+    for f in spills:
+        f.seek(0)
+        partial = {}
+        overflow = None
+        for (group, value) in _unspill(f):
+            partial[group] = combine(partial[group], value) if group in partial else value
+            if len(partial) > max_groups:
+                overflow = _spill_groups(partial, partitions, overflow, depth)
+                partial = {}
+
+        if overflow is None:
+            for item in partial.items():
+                yield item
+        else:
+            overflow = _spill_groups(partial, partitions, overflow, depth)
+            for item in _combine_spills(overflow, combine, max_groups, partitions, depth + 1):
+                yield item
+
+
+def _spill_groups(table, partitions, spills, depth):
+    # each depth partitions on the next digit of the hash, so the groups of one
+    # overfull file are spread over new files
+    if spills is None:
+        spills = [tempfile.TemporaryFile() for i in range(partitions)]
+    scale = partitions ** depth
+    for item in table.items():
+        pickle.dump(item, spills[hash(item[0]) // scale % partitions], pickle.HIGHEST_PROTOCOL)
+    return spills
+
+
+# bulk export
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def _parse_filter(text):
+    """ Parse a ``name=value`` command line filter into a keyword argument. """
+    if '=' not in text:
+        raise ValueError('filters must be given as name=value: %s' % text)
+    (param, value) = text.split('=', 1)
+    if param.endswith('__in'):
+        value = value.split(',')
+    elif param.endswith('__between'):
+        value = [datetime.datetime.strptime(v, '%Y-%m-%d').date() for v in value.split(',')]
+    return (param, value)
+
+
+def _export_streams(filters, partition=None, pages=None):
+    """
+    Split an export into independent ``(label, kwargs, first_page, last_page)``
+    streams, one per partition value. ``last_page`` is None when the stream
+    runs to the last page of its query.
+    """
+    (first, last) = [int(p) for p in pages.split('-', 1)] if pages else (1, None)
+    if partition:
+        (param, values) = partition.split('=', 1)
+        for value in values.split(','):
+            kwargs = dict(filters)
+            kwargs[param] = value
+            yield ('%s-%s' % (param, value), kwargs, first, last)
+    else:
+        yield ('all', dict(filters), first, last)
+
+
+class _ExportStream(object):
+    """
+    One stream of an export, handed to the workers a chunk of pages at a
+    time. Until the last page is known, chunks are handed out past it;
+    those that turn out to hold nothing are removed once it is found.
+    """
+
+    def __init__(self, label, kwargs, first_page, last_page):
+        self.label = label
+        self.kwargs = kwargs
+        self.first_page = first_page
+        self.next_page = first_page
+        self.last_page = last_page
+        self.written = []
+
+    def next_chunk(self, pages_per_chunk):
+        """ Return the ``(start, end)`` pages of the next chunk, or None after the last page. """
+        if self.last_page is not None and self.next_page > self.last_page:
+            return None
+        start = self.next_page
+        end = start + pages_per_chunk - 1
+        if self.last_page is not None:
+            end = min(end, self.last_page)
+        self.next_page = end + 1
+        return (start, end)
+
+    def finished(self, path, start, last_page):
+        """
+        Record a written chunk. ``last_page`` is the last page of the
+        query when it ended within the chunk, and None otherwise.
+        """
+        self.written.append((start, path))
+        if last_page is not None and (self.last_page is None or last_page < self.last_page):
+            self.last_page = last_page
+        if self.last_page is None:
+            return
+        # the first chunk is kept even when empty, to mark the stream as done
+        past = [(s, p) for (s, p) in self.written if s > self.last_page and s != self.first_page]
+        for (chunk_start, chunk_path) in past:
+            os.remove(chunk_path)
+            self.written.remove((chunk_start, chunk_path))
+
+
+def _write_pages(path, fmt, pages):
+    """ Write an iterable of record lists to ``path`` page by page. Returns the record count. """
+    count = 0
+    if fmt == 'parquet':
+        import pyarrow
+        import pyarrow.parquet
+        writer = None
+        try:
+            for records in pages:
+                if writer is None:
+                    table = pyarrow.Table.from_pylist(records)
+                    # a column that is null throughout the first page may hold strings later on
+                    schema = pyarrow.schema([
+                        field.with_type(pyarrow.string()) if pyarrow.types.is_null(field.type) else field
+                        for field in table.schema
+                    ])
+                    table = table.cast(schema)
+                    writer = pyarrow.parquet.ParquetWriter(path, schema)
+                else:
+                    # later pages are converted to the file's schema, not inferred on their own
+                    added = set(k for record in records for k in record).difference(writer.schema.names)
+                    if added:
+                        raise TransparencyDataError('fields %s first appear after the Parquet schema was written; '
+                                                    'export as jsonl or csv' % ', '.join(sorted(added)))
+                    table = pyarrow.Table.from_pylist(records, schema=writer.schema)
+                writer.write_table(table)
+                count += len(records)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            # no records, but still a valid Parquet file
+            pyarrow.parquet.write_table(pyarrow.table({}), path)
+    elif fmt == 'csv':
+        # the header needs every field of the chunk, so the records are spilled until it is known
+        fieldnames = []
+        seen = set()
+        def collect():
+            for records in pages:
+                for record in records:
+                    for k in record:
+                        if k not in seen:
+                            seen.add(k)
+                            fieldnames.append(k)
+                    yield record
+        spilled = _spill(collect())
+        with _open_export(path) as f:
+            if not fieldnames:
+                spilled.close()
+                return 0
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for record in _unspill(spilled):
+                writer.writerow(_csv_record(record))
+                count += 1
+    else:
+        with _open_export(path) as f:
+            for records in pages:
+                for record in records:
+                    f.write(json.dumps(record))
+                    f.write('\n')
+                count += len(records)
+    return count
+
+
+def _export_task(task):
+    """
+    Fetch and write one chunk of an export. Runs in a worker process; the
+    output only appears under its final name once it is complete, which is
+    what makes exports resumable. Returns ``(path, count, last_page)``,
+    where ``last_page`` is the last page holding records if the query ended
+    within the chunk, and None otherwise.
+    """
+    (key, base_url, endpoint, fmt, per_page, path, kwargs, start_page, end_page) = task
+
+    client = getattr(TransparencyData(key), endpoint)
+    client.apiurl = base_url
+    # (last page with records, whether it was full)
+    last = [start_page - 1, False]
+    def pages():
+        for (page, records) in client.iter_pages(per_page, start_page, end_page, **kwargs):
+            last[:] = [page, len(records) >= per_page]
+            yield records
+
+    partial_path = path + '.part'
+    try:
+        count = _write_pages(partial_path, fmt, pages())
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.rename(partial_path, path)
+    ended = not (last[0] == end_page and last[1])
+    return (path, count, last[0] if ended else None)
+
+
+def _run_export_task(task):
+    """ Run :func:`_export_task`, returning ``(path, result, error message)`` so a failure never has to be pickled. """
+    try:
+        return (task[5], _export_task(task), None)
+    except Exception as e:
+        return (task[5], None, '%s: %s' % (type(e).__name__, e))
+
+
+def main(argv=None):
+    """ Command line entry point for bulk exports. """
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description='Export Transparency Data records in parallel.')
+    parser.add_argument('endpoint', choices=[name for (name, client_class) in CLIENTS])
+    parser.add_argument('--key', required=True, help='Sunlight API key')
+    parser.add_argument('--url', default=DEFAULT_URL, help='API base URL')
+    parser.add_argument('-f', '--filter', action='append', default=[], metavar='NAME=VALUE',
+                        help='query filter; __in values are comma separated, __between dates are YYYY-MM-DD,YYYY-MM-DD')
+    parser.add_argument('--partition', metavar='PARAM=V1,V2',
+                        help='export each value of a parameter (e.g. cycle or a state field) as its own stream of chunks')
+    parser.add_argument('--fields', help='comma separated fields to keep from each record')
+    parser.add_argument('--pages', metavar='FIRST-LAST', help='export only this page range of each stream')
+    parser.add_argument('--pages-per-chunk', type=int, default=10)
+    parser.add_argument('--per-page', type=int, default=1000)
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+    parser.add_argument('--output', default='.', help='output directory')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    if args.pages_per_chunk < 1:
+        parser.error('--pages-per-chunk must be at least 1')
+    if args.format == 'parquet':
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            parser.error('parquet output requires pyarrow')
+    try:
+        filters = dict(_parse_filter(f) for f in args.filter)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.fields:
+        filters['fields'] = args.fields.split(',')
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    streams = deque(_ExportStream(*s) for s in _export_streams(filters, args.partition, args.pages))
+    processes = args.processes or multiprocessing.cpu_count()
+    results = Queue()
+    running = {}
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        while True:
+            # keep twice as many chunks queued as there are workers, taking them from the streams in turn
+            while len(running) < processes * 2 and streams:
+                stream = streams.popleft()
+                chunk = stream.next_chunk(args.pages_per_chunk)
+                if chunk is None:
+                    continue
+                streams.append(stream)
+                (start, end) = chunk
+                path = os.path.join(args.output, '%s-%s-pages-%d-%d.%s' % (args.endpoint, stream.label, start, end, args.format))
+                if os.path.exists(path):
+                    # finished by an earlier run
+                    continue
+                running[path] = (stream, start)
+                task = (args.key, args.url, args.endpoint, args.format, args.per_page, path, stream.kwargs, start, end)
+                pool.apply_async(_run_export_task, (task,), callback=results.put)
+            if not running:
+                break
+
+            (path, result, error) = results.get()
+            if error is not None:
+                # the pool is terminated on the way out
+                parser.exit(1, '%s: error: %s: %s\n' % (parser.prog, path, error))
+            (path, count, last_page) = result
+            (stream, start) = running.pop(path)
+            stream.finished(path, start, last_page)
+            if os.path.exists(path):
+                sys.stderr.write('%s: %d records\n' % (path, count))
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())